@@ -0,0 +1,41 @@
+"""index existing spreadsheets
+
+Revision ID: 0a4081da4d63
+Revises: 5804b6df7c70
+Create Date: 2026-10-17 19:26:03.551470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a4081da4d63'
+down_revision: Union[str, None] = '5804b6df7c70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # .xlsx became indexable, queue spreadsheets uploaded before that
+    op.execute(
+        """
+        INSERT INTO ingestion_jobs (file_id, status, attempts, run_after, created_at, updated_at)
+        SELECT id, 'pending', 0, now(), now(), now()
+        FROM files
+        WHERE format = '.xlsx' AND index_status IS NULL AND should_delete = false
+        """
+    )
+    op.execute(
+        """
+        UPDATE files SET index_status = 'pending'
+        WHERE format = '.xlsx' AND index_status IS NULL AND should_delete = false
+        """
+    )
+
+
+def downgrade() -> None:
+    # Indexed spreadsheets stay searchable, nothing to undo
+    pass
@@ -0,0 +1,31 @@
+"""add scheduled_jobs run_at
+
+Revision ID: 1214d65ef1f9
+Revises: b8ad8cbec002
+Create Date: 2026-10-17 16:02:18.305417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1214d65ef1f9'
+down_revision: Union[str, None] = 'b8ad8cbec002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('scheduled_jobs', sa.Column('run_at', sa.DateTime(), nullable=True))
+    # Jobs scheduled before the upgrade only lived in memory, let the sweeper pick them up
+    op.execute("UPDATE scheduled_jobs SET run_at = COALESCE(created_at, now()) + interval '30 seconds'")
+    op.alter_column('scheduled_jobs', 'run_at', nullable=False)
+    op.create_index(op.f('ix_scheduled_jobs_run_at'), 'scheduled_jobs', ['run_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_scheduled_jobs_run_at'), table_name='scheduled_jobs')
+    op.drop_column('scheduled_jobs', 'run_at')
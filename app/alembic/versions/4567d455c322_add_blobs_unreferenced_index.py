@@ -0,0 +1,38 @@
+"""add blobs unreferenced index
+
+Revision ID: 4567d455c322
+Revises: 85a3a2d95565
+Create Date: 2026-10-17 22:11:36.804125
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4567d455c322'
+down_revision: Union[str, None] = '85a3a2d95565'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The deletion sweeper looks for blobs nothing references on every pass,
+    # the index only holds those few instead of one row per unique content
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_blobs_unreferenced',
+            'blobs',
+            ['digest'],
+            unique=False,
+            postgresql_where=sa.text('ref_count <= 0'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_blobs_unreferenced', table_name='blobs', postgresql_concurrently=True, if_exists=True)
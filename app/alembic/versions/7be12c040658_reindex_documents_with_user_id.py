@@ -0,0 +1,52 @@
+"""reindex documents with user_id
+
+Vectors written before this revision have no user_id metadata and are
+invisible to per-user /ai-search queries, so every indexable file is
+queued for ingestion again.
+
+Revision ID: 7be12c040658
+Revises: 522b3f329bae
+Create Date: 2026-10-17 12:03:27.114952
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7be12c040658'
+down_revision: Union[str, None] = '522b3f329bae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Live files only, trashed ones are about to be purged. Files with a job
+    # still open already get indexed, a second job would index them twice.
+    # should_delete is NULL on rows from before the column existed
+    op.execute(
+        """
+        WITH queued AS (
+            INSERT INTO ingestion_jobs (file_id, status, attempts, run_after, created_at, updated_at)
+            SELECT id, 'pending', 0, now(), now(), now()
+            FROM files
+            WHERE format IN ('.docx', '.pptx', '.txt', '.pdf')
+            AND should_delete IS NOT TRUE
+            AND NOT EXISTS (
+                SELECT 1 FROM ingestion_jobs
+                WHERE ingestion_jobs.file_id = files.id AND ingestion_jobs.status IN ('pending', 'running')
+            )
+            RETURNING file_id
+        )
+        UPDATE files SET index_status = 'pending'
+        FROM queued
+        WHERE files.id = queued.file_id
+        """
+    )
+
+
+def downgrade() -> None:
+    # Re-indexed vectors only gained metadata, nothing to undo
+    pass
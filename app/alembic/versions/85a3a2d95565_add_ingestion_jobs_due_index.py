@@ -0,0 +1,37 @@
+"""add ingestion_jobs due index
+
+Revision ID: 85a3a2d95565
+Revises: 5a80edc87513
+Create Date: 2026-10-17 22:04:51.672390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '85a3a2d95565'
+down_revision: Union[str, None] = '5a80edc87513'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Workers poll for the earliest due open job, done and failed rows stay out of the index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_ingestion_jobs_run_after_open',
+            'ingestion_jobs',
+            ['run_after'],
+            unique=False,
+            postgresql_where=sa.text("status IN ('pending', 'running')"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_ingestion_jobs_run_after_open', table_name='ingestion_jobs', postgresql_concurrently=True, if_exists=True)
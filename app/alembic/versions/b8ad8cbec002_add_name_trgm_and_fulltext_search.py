@@ -0,0 +1,60 @@
+"""add name trgm and fulltext search
+
+Revision ID: b8ad8cbec002
+Revises: ed55f6e9584d
+Create Date: 2026-10-17 15:21:44.873150
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import FULLTEXT_CONFIG
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8ad8cbec002'
+down_revision: Union[str, None] = 'ed55f6e9584d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column('files', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    # Names only, document text is added when files are (re)indexed.
+    # Same text search configuration as new rows and queries use
+    op.execute(
+        sa.text(
+            "UPDATE files SET search_vector = setweight(to_tsvector(CAST(:config AS regconfig), name), 'A')"
+        ).bindparams(config=FULLTEXT_CONFIG)
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_files_name_trgm',
+            'files',
+            [sa.text('lower(name) gin_trgm_ops')],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_files_search_vector',
+            'files',
+            ['search_vector'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_files_search_vector', table_name='files', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_files_name_trgm', table_name='files', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('files', 'search_vector')
@@ -0,0 +1,43 @@
+"""add listing indexes
+
+Revision ID: c58ca7d5c6dd
+Revises: 7be12c040658
+Create Date: 2026-10-17 13:26:51.730418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58ca7d5c6dd'
+down_revision: Union[str, None] = '7be12c040658'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY doesn't block writes on big tables, but can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_files_user_id_created_at_active',
+            'files',
+            ['user_id', sa.text('created_at DESC')],
+            unique=False,
+            postgresql_where=sa.text('should_delete = false'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(op.f('ix_favorites_file_id'), 'favorites', ['file_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_favorites_user_id'), 'favorites', ['user_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index(op.f('ix_scheduled_jobs_file_id'), 'scheduled_jobs', ['file_id'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_scheduled_jobs_file_id'), table_name='scheduled_jobs', postgresql_concurrently=True, if_exists=True)
+        op.drop_index(op.f('ix_favorites_user_id'), table_name='favorites', postgresql_concurrently=True, if_exists=True)
+        op.drop_index(op.f('ix_favorites_file_id'), table_name='favorites', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_files_user_id_created_at_active', table_name='files', postgresql_concurrently=True, if_exists=True)
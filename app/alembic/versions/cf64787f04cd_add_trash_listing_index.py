@@ -0,0 +1,37 @@
+"""add trash listing index
+
+Revision ID: cf64787f04cd
+Revises: 4567d455c322
+Create Date: 2026-10-17 22:26:13.417806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cf64787f04cd'
+down_revision: Union[str, None] = '4567d455c322'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # /deleted, restoring and emptying the trash: the counterpart of the active files index
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_files_user_id_created_at_id_trashed',
+            'files',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_where=sa.text('should_delete = true'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_files_user_id_created_at_id_trashed', table_name='files', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,48 @@
+"""add id to listing index
+
+Keyset pagination orders by (created_at, id), the index covers both.
+
+Revision ID: ed55f6e9584d
+Revises: c58ca7d5c6dd
+Create Date: 2026-10-17 14:08:12.402771
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ed55f6e9584d'
+down_revision: Union[str, None] = 'c58ca7d5c6dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_files_user_id_created_at_id_active',
+            'files',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            unique=False,
+            postgresql_where=sa.text('should_delete = false'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index('ix_files_user_id_created_at_active', table_name='files', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_files_user_id_created_at_active',
+            'files',
+            ['user_id', sa.text('created_at DESC')],
+            unique=False,
+            postgresql_where=sa.text('should_delete = false'),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.drop_index('ix_files_user_id_created_at_id_active', table_name='files', postgresql_concurrently=True, if_exists=True)
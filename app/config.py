@@ -11,6 +11,13 @@ POSTGRES_PORT = 5431
 
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# Connection pool of each engine (every uvicorn worker has its own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server side limit of a single statement, 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 JWT_REFRESH_SECRET_KEY = os.getenv("JWT_REFRESH_SECRET_KEY")
 ALGORITHM = os.getenv("JWT_ALGORITHM")
@@ -19,6 +26,100 @@ MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY")
 MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
 MINIO_BUCKET = os.getenv("MINIO_BUCKET")
 MINIO_HOSTNAME = os.getenv("MINIO_HOSTNAME")
+# Multipart part size for streamed uploads, S3 requires at least 5 MiB
+MINIO_PART_SIZE = int(os.getenv("MINIO_PART_SIZE", 16 * 1024 * 1024))
+# Max connections kept open to MinIO and max blocking MinIO calls running at once
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", 10))
+MINIO_MAX_WORKERS = int(os.getenv("MINIO_MAX_WORKERS", 8))
+# Presigned URLs are signed for the host clients reach MinIO at, which may differ
+# from the one the API uses. The region is fixed so signing needs no request
+MINIO_PUBLIC_HOSTNAME = os.getenv("MINIO_PUBLIC_HOSTNAME", MINIO_HOSTNAME)
+MINIO_REGION = os.getenv("MINIO_REGION", "us-east-1")
+PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", 3600))
+# Presigned uploads not completed within this many seconds are aborted and
+# their objects deleted by the deletion sweeper. Keep it above PRESIGNED_URL_EXPIRES
+UPLOAD_EXPIRY_SECONDS = int(os.getenv("UPLOAD_EXPIRY_SECONDS", 86400))
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX")
+
+# "pinecone" or "local" (NumPy index persisted under LOCAL_VECTOR_STORE_PATH)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+LOCAL_VECTOR_STORE_PATH = os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_store")
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Load the model and connect to the vector store in the background at startup
+# instead of on the first request
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "false").lower() in ("1", "true", "yes")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", 384))
+# Number of texts encoded per SentenceTransformer forward pass
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+# How long concurrent query encodes are collected into one batch
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+
+# Number of documents returned by /ai-search, the vector store is asked for
+# AI_SEARCH_TOP_K * AI_SEARCH_OVERFETCH chunks to fill it after per-document dedup
+AI_SEARCH_TOP_K = int(os.getenv("AI_SEARCH_TOP_K", 10))
+AI_SEARCH_OVERFETCH = int(os.getenv("AI_SEARCH_OVERFETCH", 5))
+
+# /ai-search caches: query embeddings (LRU) and per-user matches (LRU + TTL seconds, 0 disables)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+SEARCH_RESULTS_CACHE_SIZE = int(os.getenv("SEARCH_RESULTS_CACHE_SIZE", 1024))
+SEARCH_RESULTS_CACHE_TTL = float(os.getenv("SEARCH_RESULTS_CACHE_TTL", 30))
+
+# Full-text search over file names and extracted text. Stored tsvectors are built
+# with FULLTEXT_CONFIG, files have to be re-indexed after changing it
+FULLTEXT_CONFIG = os.getenv("FULLTEXT_CONFIG", "english")
+FULLTEXT_MAX_CHARS = int(os.getenv("FULLTEXT_MAX_CHARS", 200_000))
+
+# /hybrid-search: candidates taken from each of keyword and semantic search,
+# and the k constant of reciprocal rank fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 100))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", 60))
+
+# Background text extraction and embedding of uploaded documents
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", 2))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", 5))
+INGESTION_BACKOFF_SECONDS = float(os.getenv("INGESTION_BACKOFF_SECONDS", 5))
+INGESTION_POLL_INTERVAL = float(os.getenv("INGESTION_POLL_INTERVAL", 2))
+# A running job whose worker died is picked up again after this lease expires
+INGESTION_JOB_TIMEOUT = int(os.getenv("INGESTION_JOB_TIMEOUT", 600))
+
+# Document parsing runs in separate processes, one per ingestion worker,
+# at most EXTRACTION_WORKERS at once
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", 2))
+# Seconds one document may take, EXTRACTION_FORMAT_TIMEOUTS overrides it per
+# format, e.g. ".pdf=300,.txt=30". Keep them below INGESTION_JOB_TIMEOUT
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", 120))
+EXTRACTION_FORMAT_TIMEOUTS = {
+    ext.strip().lower(): float(seconds)
+    for ext, seconds in (
+        item.split("=") for item in os.getenv("EXTRACTION_FORMAT_TIMEOUTS", ".pdf=300").split(",") if item
+    )
+}
+# Address space limit of a worker process (0 disables it), and documents a
+# worker parses before it's replaced by a fresh process
+EXTRACTION_MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_LIMIT_MB", 2048))
+EXTRACTION_MAX_TASKS_PER_CHILD = int(os.getenv("EXTRACTION_MAX_TASKS_PER_CHILD", 50))
+# "pdfium" (pypdfium2, plain text, fast) or "pdfplumber" (pdfminer layout analysis,
+# slower but better at columns and tables). pdfplumber is used if pdfium can't open a file
+PDF_ENGINE = os.getenv("PDF_ENGINE", "pdfium")
+# Spreadsheets are indexed up to this many non-empty rows and cells, over all sheets
+XLSX_MAX_ROWS = int(os.getenv("XLSX_MAX_ROWS", 100_000))
+XLSX_MAX_CELLS = int(os.getenv("XLSX_MAX_CELLS", 1_000_000))
+
+# How documents are split before embedding: "sentence" packs whole sentences into
+# chunks of at most CHUNK_MAX_TOKENS tokens, "fixed" cuts 1050-character windows.
+# 0 takes the max sequence length of EMBEDDING_MODEL from its hub configuration
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "sentence")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 0))
+# Tokens of trailing sentences a chunk repeats from the previous one
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+# Deferred deletion of trashed files, swept from the scheduled_jobs table
+DELETION_DELAY_SECONDS = int(os.getenv("DELETION_DELAY_SECONDS", 30))
+# One batch is one multi-object delete request, S3 takes at most 1000 keys per request
+DELETION_BATCH_SIZE = int(os.getenv("DELETION_BATCH_SIZE", 1000))
+DELETION_POLL_INTERVAL = float(os.getenv("DELETION_POLL_INTERVAL", 5))
+# A file whose storage delete failed is retried after this delay
+DELETION_RETRY_SECONDS = int(os.getenv("DELETION_RETRY_SECONDS", 60))
@@ -1,27 +1,269 @@
-from app.services.minio import delete_file as delete_from_minio_s3
-from sqlalchemy.orm import Session
-from app.schemas import File
-from apscheduler.schedulers.background import BackgroundScheduler
+import threading
+import time
+from collections import Counter
 from datetime import datetime, timedelta
 
-scheduler = BackgroundScheduler()
+from sqlalchemy import delete, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import models
+from app.config import (
+    DELETION_DELAY_SECONDS,
+    DELETION_BATCH_SIZE,
+    DELETION_POLL_INTERVAL,
+    DELETION_RETRY_SECONDS,
+)
+from app.database import SessionLocal
+from app.services.minio import abort_multipart_upload_sync, blob_key, delete_objects_sync, get_object_name
+from app.services.vector_store import get_vector_store
 
-async def schedule_file_deletion(db: Session, file: File):
-    def delete_file():
+_stop_event = threading.Event()
+_sweeper: threading.Thread | None = None
+
+
+def schedule_file_deletion(db: AsyncSession, file: models.File) -> models.ScheduledJob:
+    """Adds deletion job within the caller's transaction, the sweeper purges the file once it's due"""
+    job = models.ScheduledJob(
+        file_id=file.id,
+        run_at=datetime.utcnow() + timedelta(seconds=DELETION_DELAY_SECONDS),
+    )
+    db.add(job)
+    return job
+
+
+async def schedule_files_deletion(db: AsyncSession, file_ids: list[int]) -> None:
+    """Bulk variant of schedule_file_deletion, one multi-row insert within the caller's transaction"""
+    if not file_ids:
+        return
+    run_at = datetime.utcnow() + timedelta(seconds=DELETION_DELAY_SECONDS)
+    await db.execute(
+        insert(models.ScheduledJob),
+        [{"file_id": file_id, "run_at": run_at} for file_id in file_ids],
+    )
+
+
+def purge_due_files(batch_size: int = DELETION_BATCH_SIZE) -> int:
+    """
+    Deletes one batch of files whose deletion is due: objects with one
+    multi-object delete, then embeddings, then all rows in one transaction,
+    releasing the files' references to their blobs.
+    Returns:
+        int: Number of claimed jobs, less than batch_size means nothing else is due.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db, db.begin():
+        # Rows stay locked until commit, SKIP LOCKED lets sweepers of other
+        # processes take the next batch instead of waiting on this one
+        rows = db.execute(
+            select(models.ScheduledJob.id, models.File)
+            .join(models.ScheduledJob.files)
+            .where(models.ScheduledJob.run_at <= now)
+            .order_by(models.ScheduledJob.run_at)
+            .limit(batch_size)
+            .with_for_update(of=models.ScheduledJob, skip_locked=True)
+        ).all()
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        stale: list[int] = []
+        due: dict[int, models.File] = {}
+        jobs_by_file: dict[int, list[int]] = {}
+        for job_id, file in rows:
+            if not file.should_delete:
+                # File was restored, only the job is left to drop
+                stale.append(job_id)
+                continue
+            due[file.id] = file
+            jobs_by_file.setdefault(file.id, []).append(job_id)
+
+        # A worker indexing a file would store vectors after its own are deleted here.
+        # Locking the files' ingestion jobs keeps workers from claiming them until
+        # they're deleted with the files; files of a running job wait for it to end.
+        # A job whose lease expired has lost its worker, a late finish cleans up after itself
+        ingestion_jobs = db.execute(
+            select(models.IngestionJob.file_id, models.IngestionJob.status, models.IngestionJob.run_after)
+            .where(models.IngestionJob.file_id.in_(due))
+            .with_for_update()
+        ).all() if due else []
+        busy = {
+            file_id
+            for file_id, status, run_after in ingestion_jobs
+            if status == models.JOB_RUNNING and run_after > now
+        }
+        for file_id in busy:
+            del due[file_id]
+
+        # External deletes go first: if the transaction fails afterwards, the retry
+        # deletes already missing objects and vectors instead of leaking them.
+        # Only objects of files from before content addressing, shared blobs
+        # are removed by purge_unreferenced_blobs once nothing references them
+        legacy = {file_id: get_object_name(file) for file_id, file in due.items() if not file.digest}
+        storage_errors = delete_objects_sync(list(set(legacy.values())))
+        failed = {file_id for file_id, name in legacy.items() if name in storage_errors}
+        for name, error in storage_errors.items():
+            print(f"Error occurred during deletion of object {name}: {error}")
+        storage_done = time.perf_counter()
+
+        indexed = [str(file_id) for file_id, file in due.items() if file.index_status and file_id not in failed]
         try:
-            db.delete(file)
-            db.commit()
-            # Delete the file from storage minIO
-            delete_from_minio_s3(file)
+            if indexed:
+                get_vector_store().delete(indexed)
+        except Exception as e:
+            print(f"Error occurred during deletion of embeddings: {e}")
+            failed.update(int(file_id) for file_id in indexed)
+        vectors_done = time.perf_counter()
+
+        purged = [file_id for file_id in due if file_id not in failed]
+        retry = [job_id for file_id in failed | busy for job_id in jobs_by_file[file_id]]
+
+        if stale:
+            db.execute(delete(models.ScheduledJob).where(models.ScheduledJob.id.in_(stale)))
+        if retry:
+            db.execute(
+                update(models.ScheduledJob)
+                .where(models.ScheduledJob.id.in_(retry))
+                .values(run_at=now + timedelta(seconds=DELETION_RETRY_SECONDS))
+            )
+        if purged:
+            # Children first, none of the foreign keys cascade in the database
+            for model in (models.Favorite, models.IngestionJob, models.ScheduledJob):
+                db.execute(delete(model).where(model.file_id.in_(purged)))
+            db.execute(delete(models.File).where(models.File.id.in_(purged)))
+
+            references = Counter(due[file_id].digest for file_id in purged if due[file_id].digest)
+            if references:
+                db.execute(
+                    text(
+                        "UPDATE blobs SET ref_count = blobs.ref_count - released.count "
+                        "FROM unnest(:digests, :counts) AS released(digest, count) "
+                        "WHERE blobs.digest = released.digest"
+                    ),
+                    {"digests": list(references), "counts": list(references.values())},
+                )
+
+    finished = time.perf_counter()
+    print(
+        f"Purge batch: {len(rows)} claimed, {len(purged)} purged, {len(failed)} failed, "
+        f"{len(busy)} still indexing, {len(stale)} stale; storage {(storage_done - started) * 1000:.0f} ms, "
+        f"vectors {(vectors_done - storage_done) * 1000:.0f} ms, "
+        f"database {(finished - vectors_done) * 1000:.0f} ms"
+    )
+
+    return len(rows)
 
-            print(f"Deleted file record from database: {file.name}")
+
+def purge_unreferenced_blobs(batch_size: int = DELETION_BATCH_SIZE) -> int:
+    """
+    Deletes one batch of blobs no file references anymore.
+    Returns:
+        int: Number of claimed blobs.
+    """
+    with SessionLocal() as db, db.begin():
+        # Uploads of the same content lock the row while referencing the blob: a
+        # blob they re-referenced first is skipped, one purged here they see is
+        # gone, or its object missing, and store the object again
+        digests = db.scalars(
+            select(models.Blob.digest)
+            .where(models.Blob.ref_count <= 0)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not digests:
+            return 0
+
+        started = time.perf_counter()
+        storage_errors = delete_objects_sync([blob_key(digest) for digest in digests])
+        for name, error in storage_errors.items():
+            print(f"Error occurred during deletion of object {name}: {error}")
+
+        # Blobs whose object is still there stay for the next pass
+        removed = [digest for digest in digests if blob_key(digest) not in storage_errors]
+        if removed:
+            db.execute(delete(models.Blob).where(models.Blob.digest.in_(removed)))
+
+    print(
+        f"Blob purge batch: {len(digests)} claimed, {len(removed)} removed, "
+        f"{len(digests) - len(removed)} failed; {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    return len(digests)
+
+
+def purge_expired_uploads(batch_size: int = DELETION_BATCH_SIZE) -> int:
+    """
+    Aborts one batch of presigned uploads the client never completed,
+    dropping their uploaded parts or objects.
+    Returns:
+        int: Number of claimed uploads.
+    """
+    now = datetime.utcnow()
+    with SessionLocal() as db, db.begin():
+        # Completing an upload locks its row too: a locked upload is skipped,
+        # one removed here can't be completed anymore
+        uploads = db.scalars(
+            select(models.PendingUpload)
+            .where(models.PendingUpload.expires_at <= now)
+            .order_by(models.PendingUpload.expires_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not uploads:
+            return 0
+
+        started = time.perf_counter()
+        failed: set[str] = set()
+        for upload in uploads:
+            if not upload.upload_id:
+                continue
+            try:
+                abort_multipart_upload_sync(upload.object_key, upload.upload_id)
+            except Exception as e:
+                print(f"Error occurred during abort of upload {upload.object_key}: {e}")
+                failed.add(upload.object_key)
+
+        # The object exists if the client finished uploading but never completed
+        storage_errors = delete_objects_sync([upload.object_key for upload in uploads])
+        for name, error in storage_errors.items():
+            print(f"Error occurred during deletion of object {name}: {error}")
+        failed.update(storage_errors)
+
+        # Failed ones stay for the next pass
+        removed = [upload.id for upload in uploads if upload.object_key not in failed]
+        if removed:
+            db.execute(delete(models.PendingUpload).where(models.PendingUpload.id.in_(removed)))
+
+    print(
+        f"Upload purge batch: {len(uploads)} claimed, {len(removed)} removed, "
+        f"{len(uploads) - len(removed)} failed; {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    return len(uploads)
+
+
+def _sweeper_loop() -> None:
+    while not _stop_event.is_set():
+        try:
+            claimed = purge_due_files()
+            purge_unreferenced_blobs()
+            purge_expired_uploads()
         except Exception as e:
-            print(f"Error occurred during file deletion: {e}")
+            print(f"Deletion sweeper error: {e}")
+            claimed = 0
+
+        # A full batch means more may be due already
+        if claimed < DELETION_BATCH_SIZE:
+            _stop_event.wait(DELETION_POLL_INTERVAL)
+
 
-    date = datetime.now() + timedelta(seconds=30)
-    job = scheduler.add_job(delete_file, "date", run_date=date)
+def start_sweeper() -> None:
+    global _sweeper
+    _stop_event.clear()
+    _sweeper = threading.Thread(target=_sweeper_loop, name="deletion-sweeper", daemon=True)
+    _sweeper.start()
 
-    print("Job has been scheduled successfully")
 
-    return job.id
+def stop_sweeper() -> None:
+    global _sweeper
+    _stop_event.set()
+    if _sweeper:
+        _sweeper.join()
+        _sweeper = None
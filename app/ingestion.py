@@ -0,0 +1,194 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from tempfile import NamedTemporaryFile
+
+from sqlalchemy import ColumnElement, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import (
+    INGESTION_WORKERS,
+    INGESTION_MAX_ATTEMPTS,
+    INGESTION_BACKOFF_SECONDS,
+    INGESTION_POLL_INTERVAL,
+    INGESTION_JOB_TIMEOUT,
+)
+from app.database import SessionLocal
+from app.schemas import File
+from app.search import copied_tsvector, document_tsvector
+from app.services.cache import invalidate_user_search_results
+from app.services.extraction_pool import extraction_pool
+from app.services.minio import download_file_sync
+from app.services.vector_store import get_vector_store
+
+_stop_event = threading.Event()
+_workers: list[threading.Thread] = []
+
+
+def enqueue_file_indexing(db: AsyncSession, file: models.File) -> models.IngestionJob:
+    """Adds indexing job within the caller's transaction"""
+    file.index_status = models.INDEX_PENDING
+    job = models.IngestionJob(file_id=file.id)
+    db.add(job)
+    return job
+
+
+def _claim_job(db: Session) -> tuple[int, File] | None:
+    now = datetime.utcnow()
+    with db.begin():
+        # SKIP LOCKED lets several workers (and processes) poll the same table
+        # without handing out one job twice
+        job = (
+            db.query(models.IngestionJob)
+            .filter(
+                models.IngestionJob.status.in_([models.JOB_PENDING, models.JOB_RUNNING]),
+                models.IngestionJob.run_after <= now,
+            )
+            .order_by(models.IngestionJob.run_after)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            return None
+
+        job.status = models.JOB_RUNNING
+        job.attempts += 1
+        # Lease: if this worker dies the job becomes claimable again
+        job.run_after = now + timedelta(seconds=INGESTION_JOB_TIMEOUT)
+        job.files.index_status = models.INDEX_INDEXING
+        # Snapshot, so nothing is lazily loaded while the job runs outside the transaction
+        claimed = job.id, File.model_validate(job.files)
+
+    return claimed
+
+
+def _discard_vectors(file: File) -> None:
+    """Vectors of a file purged while it was being indexed, nothing else would delete them"""
+    print(f"File {file.id} was deleted during indexing, discarding its embeddings")
+    try:
+        get_vector_store().delete([str(file.id)])
+    except Exception as e:
+        print(f"Error occurred during deletion of embeddings of file {file.id}: {e}")
+
+
+def _finish_job(db: Session, job_id: int, file: File, search_vector: ColumnElement) -> None:
+    with db.begin():
+        # Locked, so the purge either waits for this commit or has already deleted the job
+        job = db.get(models.IngestionJob, job_id, with_for_update=True)
+        if job is not None:
+            job.status = models.JOB_DONE
+            job.last_error = None
+            job.files.index_status = models.INDEX_INDEXED
+            job.files.search_vector = search_vector
+
+    if job is None:
+        _discard_vectors(file)
+        return
+    # New embeddings may change this user's /ai-search results
+    invalidate_user_search_results(file.user_id)
+
+
+def _fail_job(db: Session, job_id: int, file: File, error: Exception) -> None:
+    with db.begin():
+        job = db.get(models.IngestionJob, job_id, with_for_update=True)
+        if job is not None:
+            job.last_error = str(error)
+            if job.attempts >= INGESTION_MAX_ATTEMPTS:
+                job.status = models.JOB_FAILED
+                job.files.index_status = models.INDEX_FAILED
+            else:
+                # Exponential backoff: 5s, 10s, 20s, ...
+                delay = INGESTION_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+                job.status = models.JOB_PENDING
+                job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+                job.files.index_status = models.INDEX_PENDING
+
+    if job is None:
+        # Some batches may have been stored before the failure
+        _discard_vectors(file)
+
+
+def index_file(file: File) -> str:
+    """Extracts and embeds the file, returns the beginning of its text for full-text search"""
+    with download_file_sync(file) as temp, NamedTemporaryFile("r", suffix=".jsonl") as chunks_file:
+        # Parsed in a worker process, under its timeout and memory limit.
+        # Chunks come back through a file and are embedded batch by batch
+        _, text = extraction_pool.extract_chunks(temp.name, file.format, chunks_file.name)
+        get_vector_store().upload_chunks(
+            (json.loads(line) for line in chunks_file), str(file.id), file.user_id
+        )
+    return text
+
+
+def _find_indexed_copy(db: Session, file: File) -> int | None:
+    """Another indexed file with the same content, whose vectors can be reused"""
+    if not file.digest:
+        return None
+    with db.begin():
+        return db.scalar(
+            select(models.File.id)
+            .filter(
+                models.File.digest == file.digest,
+                models.File.index_status == models.INDEX_INDEXED,
+                models.File.id != file.id,
+            )
+            .limit(1)
+        )
+
+
+def index_file_copy(file: File, source_id: int) -> bool:
+    """Copies the vectors of source_id, returns False if it has none left"""
+    return get_vector_store().copy_document(str(source_id), str(file.id), file.user_id)
+
+
+def process_next_job() -> bool:
+    """Runs one due job, returns False if there was nothing to do"""
+    with SessionLocal() as db:
+        claimed = _claim_job(db)
+        if not claimed:
+            return False
+
+        job_id, file = claimed
+        try:
+            # Duplicate content is neither extracted nor encoded again
+            source_id = _find_indexed_copy(db, file)
+            if source_id and index_file_copy(file, source_id):
+                search_vector = copied_tsvector(file.name, source_id)
+            else:
+                search_vector = document_tsvector(file.name, index_file(file))
+        except Exception as e:
+            print(f"Error occurred during indexing of file {file.id}: {e}")
+            _fail_job(db, job_id, file, e)
+        else:
+            _finish_job(db, job_id, file, search_vector)
+
+    return True
+
+
+def _worker_loop() -> None:
+    while not _stop_event.is_set():
+        try:
+            processed = process_next_job()
+        except Exception as e:
+            print(f"Ingestion worker error: {e}")
+            processed = False
+
+        if not processed:
+            _stop_event.wait(INGESTION_POLL_INTERVAL)
+
+
+def start_workers() -> None:
+    _stop_event.clear()
+    for i in range(INGESTION_WORKERS):
+        worker = threading.Thread(target=_worker_loop, name=f"ingestion-{i}", daemon=True)
+        worker.start()
+        _workers.append(worker)
+
+
+def stop_workers() -> None:
+    _stop_event.set()
+    for worker in _workers:
+        worker.join()
+    _workers.clear()
@@ -1,8 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from .config import WARMUP_MODELS
 from .routers import files
+from .cron import start_sweeper, stop_sweeper
+from .ingestion import start_workers, stop_workers
+from .services.embedding import embedding_service
+from .services.extraction_pool import extraction_pool
+from .services.minio import ensure_bucket
+from .services.vector_store import get_vector_store
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+
+def warm_up() -> None:
+    try:
+        get_vector_store().warm_up()
+        embedding_service.warm_up()
+    except Exception as e:
+        # Not fatal, first request will retry the lazy initialization
+        print(f"Warm up failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Provision the bucket once, uploads rely on the cached state afterwards
+    await ensure_bucket()
+    start_workers()
+    start_sweeper()
+    # Models load in the background, so the app serves requests right away
+    warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up)) if WARMUP_MODELS else None
+    yield
+    if warm_up_task:
+        await warm_up_task
+    stop_workers()
+    stop_sweeper()
+    extraction_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
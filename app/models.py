@@ -1,13 +1,53 @@
+import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, UUID, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, UUID, ForeignKey, Boolean, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 
 from .database import Base
 
+# Values of File.index_status, None means the format isn't indexable
+INDEX_PENDING = "pending"
+INDEX_INDEXING = "indexing"
+INDEX_INDEXED = "indexed"
+INDEX_FAILED = "failed"
+
+# Values of IngestionJob.status
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
 
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        # Listing queries: user's live files, newest first, id breaks ties for keyset pagination
+        Index(
+            "ix_files_user_id_created_at_id_active",
+            "user_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_where=text("should_delete = false"),
+        ),
+        # /deleted and trash restore/empty, filtered with should_delete = true to match it
+        Index(
+            "ix_files_user_id_created_at_id_trashed",
+            "user_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_where=text("should_delete = true"),
+        ),
+        # /search: substring and similarity match on the name (pg_trgm)
+        Index(
+            "ix_files_name_trgm",
+            text("lower(name) gin_trgm_ops"),
+            postgresql_using="gin",
+        ),
+        # /search?mode=fulltext
+        Index("ix_files_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -17,6 +57,15 @@ class File(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     should_delete = Column(Boolean, default=False)
+    index_status = Column(String, nullable=True)
+    # sha256 of the content, the object is stored once per digest.
+    # None for files uploaded before content addressing, stored under name + format
+    digest = Column(String, ForeignKey("blobs.digest"), nullable=True, index=True)
+    # Key of an object the client uploaded itself through a presigned URL
+    object_key = Column(String, nullable=True, unique=True)
+    # Name, plus extracted text once the file is indexed.
+    # Deferred, listings shouldn't load whole documents' tsvectors
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
 
     favorites = relationship(
         "Favorite", back_populates="files", cascade="all, delete-orphan"
@@ -24,14 +73,44 @@ class File(Base):
     scheduled_jobs = relationship(
         "ScheduledJob", back_populates="files", cascade="all, delete-orphan"
     )
+    ingestion_jobs = relationship(
+        "IngestionJob", back_populates="files", cascade="all, delete-orphan"
+    )
+
+
+class Blob(Base):
+    """One stored object, shared by all files with the same content"""
+    __tablename__ = "blobs"
+    __table_args__ = (
+        # The deletion sweeper's pass over blobs nothing references
+        Index("ix_blobs_unreferenced", "digest", postgresql_where=text("ref_count <= 0")),
+    )
+
+    digest = Column(String, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    # Files referencing the object, the deletion sweeper removes it at zero
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PendingUpload(Base):
+    """Presigned upload the client hasn't completed yet, the deletion sweeper removes it once expired"""
+    __tablename__ = "pending_uploads"
+
+    id = Column(Integer, primary_key=True)
+    object_key = Column(String, nullable=False, unique=True)
+    # Set for multipart uploads, which hold their parts in MinIO until completed or aborted
+    upload_id = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
 
 class Favorite(Base):
     __tablename__ = "favorites"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False)
-    file_id = Column(Integer, ForeignKey("files.id"), nullable=False)
+    user_id = Column(Integer, nullable=False, index=True)
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
 
     files = relationship("File", back_populates="favorites")
 
@@ -40,8 +119,35 @@ class ScheduledJob(Base):
     __tablename__ = "scheduled_jobs"
 
     id = Column(Integer, primary_key=True)
-    file_id = Column(Integer, ForeignKey("files.id"), nullable=False)
-    job_id = Column(UUID, nullable=False)
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
+    job_id = Column(UUID, nullable=False, default=uuid.uuid4)
+    # The deletion sweeper purges the file once this time has passed
+    run_at = Column(DateTime, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     files = relationship("File", back_populates="scheduled_jobs")
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    __table_args__ = (
+        # Workers' poll for the next due job, done and failed jobs are never polled
+        Index(
+            "ix_ingestion_jobs_run_after_open",
+            "run_after",
+            postgresql_where=text(f"status IN ('{JOB_PENDING}', '{JOB_RUNNING}')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default=JOB_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Earliest time a worker may pick the job up: backoff for retries,
+    # lease expiry for running jobs
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    files = relationship("File", back_populates="ingestion_jobs")
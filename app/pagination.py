@@ -0,0 +1,115 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, Row, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str, length: int = 2) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError(cursor)
+        return values
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(file: models.File) -> str:
+    """Opaque cursor pointing right after the file in (created_at, id) desc order"""
+    return _encode([file.created_at.isoformat(), file.id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, file_id = _decode(cursor)
+    try:
+        return datetime.fromisoformat(created_at), int(file_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, file_id: int) -> str:
+    """Opaque cursor pointing right after the file in (rank, id) desc order"""
+    return _encode([rank, file_id])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    rank, file_id = _decode(cursor)
+    try:
+        return float(rank), int(file_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Cursor for results ranked in memory, which have no stable sort key"""
+    return _encode([offset])
+
+
+def decode_offset_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    offset, = _decode(cursor, length=1)
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return offset
+
+
+def keyset_paginate(statement: Select, cursor: str | None, limit: int) -> Select:
+    """
+    Orders files newest first and continues after the cursor. One extra row
+    is fetched to find out whether there is a next page.
+    """
+    statement = statement.order_by(models.File.created_at.desc(), models.File.id.desc())
+    if cursor:
+        created_at, file_id = decode_cursor(cursor)
+        statement = statement.where(tuple_(models.File.created_at, models.File.id) < (created_at, file_id))
+
+    return statement.limit(limit + 1)
+
+
+def rank_paginate(statement: Select, rank: ColumnElement, cursor: str | None, limit: int) -> Select:
+    """
+    Same as keyset_paginate(), but orders by a relevance score, best first.
+    The score is added as the last column of every row.
+    """
+    statement = statement.add_columns(rank).order_by(rank.desc(), models.File.id.desc())
+    if cursor:
+        last_rank, file_id = decode_rank_cursor(cursor)
+        statement = statement.where(tuple_(rank, models.File.id) < (last_rank, file_id))
+
+    return statement.limit(limit + 1)
+
+
+async def fetch_page(
+    db: AsyncSession, statement: Select, limit: int, ranked: bool = False
+) -> tuple[list[Row], str | None]:
+    """
+    Runs keyset_paginate() (or rank_paginate() with ranked=True) statement
+    through a server-side cursor, so rows are streamed instead of being
+    buffered by the driver.
+    Returns:
+        tuple: Rows of the page (File first in each) and cursor of the next page or None.
+    """
+    result = await db.stream(statement.execution_options(yield_per=limit + 1))
+    rows = [row async for row in result]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_rank_cursor(last[-1], last[0].id) if ranked else encode_cursor(last[0])
+
+    return rows, next_cursor
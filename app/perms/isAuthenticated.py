@@ -4,7 +4,7 @@ from fastapi import status, HTTPException, Request
 from app.config import JWT_SECRET_KEY, ALGORITHM
 
 
-async def is_authenticated(request: Request):
+async def is_authenticated(request: Request) -> int | None:
     try:
         token = request.headers.get("Authorization").split("Bearer ")[1]
         if token:
@@ -13,7 +13,9 @@ async def is_authenticated(request: Request):
             if not is_auth:
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-            return payload.get("user_id", None)
+            user_id = payload.get("user_id", None)
+            # The claim may be a string, bound parameters of integer columns must be ints
+            return int(user_id) if user_id is not None else None
 
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
@@ -1,35 +1,92 @@
+import asyncio
 import os
-from typing import Annotated
-
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
-from sqlalchemy.sql import func
-from sqlalchemy.orm import Session
+import uuid
+from datetime import datetime, timedelta
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile
+from sqlalchemy import Integer, any_, delete, false, literal, select, true, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 from minio.error import S3Error, ServerError
 
-from app.cron import scheduler, schedule_file_deletion
-from app.database import SessionLocal
+from app.cron import schedule_file_deletion, schedule_files_deletion
+from app.database import AsyncSessionLocal
 from app import models
+from app.config import HYBRID_CANDIDATES, PRESIGNED_URL_EXPIRES, UPLOAD_EXPIRY_SECONDS
 from app.deps import is_token_expired
-from app.schemas import File, Favorite, FileID, FilesFavorite, Files
+from app.ingestion import enqueue_file_indexing
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    keyset_paginate,
+    rank_paginate,
+    fetch_page,
+    encode_offset_cursor,
+    decode_offset_cursor,
+)
+from app.schemas import (
+    File,
+    Favorite,
+    FileID,
+    FileIDs,
+    FilesFavorite,
+    Files,
+    FileIndexStatus,
+    Page,
+    ScoredFile,
+    UploadRequest,
+    PresignedUpload,
+    CompleteUpload,
+    AbortUpload,
+    DownloadURL,
+)
 from app.perms.isAuthenticated import is_authenticated
-from app.services.minio import upload_file as upload_to_minio_s3, delete_file as delete_file_from_minio_s3
-from app.services.text_extractor import TextExtractor
-from app.services.pinecone_serv import PineconeService
+from app.search import (
+    MODE_SUBSTRING,
+    MODE_SIMILARITY,
+    MODE_FULLTEXT,
+    name_matches,
+    name_similar,
+    name_similarity,
+    fulltext_matches,
+    fulltext_rank,
+    name_tsvector,
+    keyword_matches,
+    keyword_rank,
+    reciprocal_rank_fusion,
+)
+from app.services.cache import (
+    query_embedding_cache,
+    search_results_cache,
+    invalidate_user_search_results,
+    normalize_query,
+)
+from app.services.minio import (
+    upload_file as upload_to_minio_s3,
+    blob_key,
+    get_object_url,
+    hash_file,
+    presigned_put_url,
+    presigned_get_url,
+    create_multipart_upload,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    delete_object,
+    stat_object,
+)
+from app.services.vector_store import get_vector_store
 
-SUPPORTIVE_DOC_TYPES = [".docx", ".pptx", ".txt", ".pdf"]
+SUPPORTIVE_DOC_TYPES = [".docx", ".pptx", ".txt", ".pdf", ".xlsx"]
 
 router = APIRouter()
-pc = PineconeService()
-scheduler.start()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 @router.get("/connection")
@@ -41,109 +98,155 @@ async def connection():
     "/files",
     dependencies=[Depends(is_token_expired)],
     summary="Get all files",
-    response_model=list[FilesFavorite],
+    response_model=Page[FilesFavorite],
 )
 async def get_all_files(
-        db: Session = Depends(get_db),
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
         user_id: int | None = Depends(is_authenticated)
 ):
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    files = (
-        db.query(models.File, models.Favorite.id)
-        .filter(
-            models.File.user_id == user_id,
-            models.File.should_delete.is_(False)
-        )
-        .join(models.Favorite, isouter=True)
-        .order_by(models.File.created_at.desc())
-        .all()
+    files, next_cursor = await fetch_page(
+        db,
+        keyset_paginate(
+            select(models.File, models.Favorite.id)
+            .filter(
+                models.File.user_id == user_id,
+                # "= false", same predicate as the partial listing index
+                models.File.should_delete == false()
+            )
+            .join(models.Favorite, isouter=True),
+            cursor,
+            limit,
+        ),
+        limit,
     )
 
-    return [{"data": file, "fav": bool(fav_id)} for file, fav_id in files]
+    return {
+        "items": [{"data": file, "fav": bool(fav_id)} for file, fav_id in files],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get(
     "/favorites",
     dependencies=[Depends(is_token_expired)],
     summary="Get all fav files",
-    response_model=list[FilesFavorite],
+    response_model=Page[FilesFavorite],
 )
 async def get_all_favorites(
-        db: Session = Depends(get_db),
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
         user_id: int | None = Depends(is_authenticated)
 ):
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    files = (
-        db.query(models.File, models.Favorite.id)
-        .filter(
-            models.File.user_id == user_id,
-            models.File.should_delete.is_(False)
-        )
-        .join(models.File.favorites)
-        .all()
+    files, next_cursor = await fetch_page(
+        db,
+        keyset_paginate(
+            select(models.File, models.Favorite.id)
+            .filter(
+                models.File.user_id == user_id,
+                models.File.should_delete == false()
+            )
+            .join(models.File.favorites),
+            cursor,
+            limit,
+        ),
+        limit,
     )
 
-    return [{"data": file, "fav": bool(fav_id)} for file, fav_id in files]
+    return {
+        "items": [{"data": file, "fav": bool(fav_id)} for file, fav_id in files],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get(
     "/deleted",
     dependencies=[Depends(is_token_expired)],
     summary="Get all deleted files",
-    response_model=list[Files],
+    response_model=Page[Files],
 )
 async def get_all_deleted(
-        db: Session = Depends(get_db),
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
         user_id: int | None = Depends(is_authenticated)
 ):
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    files = (
-        db.query(models.File)
-        .filter(
-            models.File.user_id == user_id,
-            models.File.should_delete.is_(True)
-        )
-        .all()
+    files, next_cursor = await fetch_page(
+        db,
+        keyset_paginate(
+            select(models.File)
+            .filter(
+                models.File.user_id == user_id,
+                models.File.should_delete == true()
+            ),
+            cursor,
+            limit,
+        ),
+        limit,
     )
 
-    return [{"data": file} for file in files]
+    return {
+        "items": [{"data": file} for file, in files],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get(
     "/search",
     dependencies=[Depends(is_token_expired)],
     summary="Get all matchup files",
-    response_model=list[FilesFavorite],
+    response_model=Page[FilesFavorite],
 )
 async def get_all_search_matchups(
         q: str,
-        db: Session = Depends(get_db),
+        mode: Literal["substring", "similarity", "fulltext"] = MODE_SUBSTRING,
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
         user_id: int | None = Depends(is_authenticated)
 ):
+    """
+    substring: case-insensitive name match, newest first.
+    similarity: fuzzy (trigram) name match, most similar first.
+    fulltext: names and extracted document text, most relevant first.
+    """
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     if not q:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Query is empty!")
 
-    files = (
-        db.query(models.File, models.Favorite.id)
+    statement = (
+        select(models.File, models.Favorite.id)
         .filter(
             models.File.user_id == user_id,
-            models.File.should_delete.is_(False),
-            func.lower(models.File.name).contains(q),
+            models.File.should_delete == false(),
         )
         .join(models.Favorite, isouter=True)
-        .order_by(models.File.created_at.desc())
-        .all()
     )
+    if mode == MODE_SIMILARITY:
+        statement = rank_paginate(statement.filter(name_similar(q)), name_similarity(q), cursor, limit)
+    elif mode == MODE_FULLTEXT:
+        statement = rank_paginate(statement.filter(fulltext_matches(q)), fulltext_rank(q), cursor, limit)
+    else:
+        statement = keyset_paginate(statement.filter(name_matches(q)), cursor, limit)
 
-    return [{"data": file, "fav": bool(fav_id)} for file, fav_id in files]
+    files, next_cursor = await fetch_page(db, statement, limit, ranked=mode != MODE_SUBSTRING)
+
+    return {
+        "items": [{"data": row[0], "fav": bool(row[1])} for row in files],
+        "next_cursor": next_cursor,
+    }
 
 
 @router.get(
@@ -154,7 +257,7 @@ async def get_all_search_matchups(
 )
 async def get_all_ai_matchup_files(
         q: str,
-        db: Session = Depends(get_db),
+        db: AsyncSession = Depends(get_db),
         user_id: int | None = Depends(is_authenticated)
 ):
     if not user_id:
@@ -162,31 +265,121 @@ async def get_all_ai_matchup_files(
     if not q:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Query is empty!")
     
-    try:
-        matched_embeddings = pc.get_matched_embeddings(query=q)["matches"]
-        file_ids: list[int] = []
-        if len(matched_embeddings):
-            for file in matched_embeddings:
-                # file["score"] is accurate percentage of the answer
-                file_ids.append(int(file["metadata"]["doc_id"]))
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error in receiving mathchings - {e}"
-        )
+    cache_key = (user_id, normalize_query(q))
+    file_ids: list[int] | None = search_results_cache.get(cache_key)
+    if file_ids is None:
+        try:
+            # Best match of each of the user's documents, ordered by score
+            matched_embeddings = await get_vector_store().get_matched_embeddings(query=q, user_id=user_id)
+            file_ids = [int(file["metadata"]["doc_id"]) for file in matched_embeddings]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error in receiving mathchings - {e}"
+            )
+        search_results_cache.set(cache_key, file_ids)
 
     files = (
-        db.query(models.File, models.Favorite.id)
+        await db.execute(
+            select(models.File, models.Favorite.id)
+            .filter(
+                models.File.user_id == user_id,
+                models.File.should_delete == false(),
+                models.File.id.in_(file_ids),
+            )
+            .join(models.Favorite, isouter=True)
+        )
+    ).all()
+
+    rank = {file_id: i for i, file_id in enumerate(file_ids)}
+    files.sort(key=lambda row: rank[row[0].id])
+
+    return [{"data": file, "fav": bool(fav_id)} for file, fav_id in files]
+
+
+@router.get(
+    "/ai-search/cache-stats",
+    dependencies=[Depends(is_token_expired), Depends(is_authenticated)],
+    summary="Get AI search cache counters",
+)
+async def get_ai_search_cache_stats():
+    return {
+        "query_embeddings": query_embedding_cache.stats(),
+        "search_results": search_results_cache.stats(),
+    }
+
+
+@router.get(
+    "/hybrid-search",
+    dependencies=[Depends(is_token_expired)],
+    summary="Get files matching by keywords and meaning",
+    response_model=Page[ScoredFile],
+)
+async def get_all_hybrid_matchup_files(
+        q: str,
+        cursor: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    """
+    Runs keyword (full-text and name) and semantic search concurrently and
+    merges them with reciprocal rank fusion, best first.
+    """
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    if not q:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Query is empty!")
+
+    offset = decode_offset_cursor(cursor)
+
+    keyword_search = db.scalars(
+        select(models.File.id)
         .filter(
             models.File.user_id == user_id,
-            models.File.should_delete.is_(False),
-            models.File.id.in_(set(file_ids)),
+            models.File.should_delete == false(),
+            keyword_matches(q),
         )
-        .join(models.Favorite, isouter=True)
-        .order_by(models.File.created_at.desc())
-        .all()
+        .order_by(keyword_rank(q).desc(), models.File.id.desc())
+        .limit(HYBRID_CANDIDATES)
+    )
+    semantic_search = get_vector_store().get_matched_embeddings(
+        query=q, user_id=user_id, top_k=HYBRID_CANDIDATES
+    )
+    keyword_ids, matched_embeddings = await asyncio.gather(
+        keyword_search, semantic_search, return_exceptions=True
     )
+    if isinstance(keyword_ids, BaseException):
+        raise keyword_ids
+    if isinstance(matched_embeddings, BaseException):
+        # Keyword results are still useful when the vector store is down
+        print(f"Error in receiving matchings - {matched_embeddings}")
+        matched_embeddings = []
+
+    fused = reciprocal_rank_fusion([
+        list(keyword_ids.all()),
+        [int(match["metadata"]["doc_id"]) for match in matched_embeddings],
+    ])
+    page = fused[offset:offset + limit]
+    scores = dict(page)
+
+    # Vector store may still have embeddings of deleted files, so filter again
+    files = (
+        await db.execute(
+            select(models.File, models.Favorite.id)
+            .filter(
+                models.File.user_id == user_id,
+                models.File.should_delete == false(),
+                models.File.id.in_(scores),
+            )
+            .join(models.Favorite, isouter=True)
+        )
+    ).all()
+    files.sort(key=lambda row: (-scores[row[0].id], -row[0].id))
 
-    return [{"data": file, "fav": bool(fav_id)} for file, fav_id in files]
+    return {
+        "items": [{"data": file, "fav": bool(fav_id), "score": scores[file.id]} for file, fav_id in files],
+        "next_cursor": encode_offset_cursor(offset + limit) if offset + limit < len(fused) else None,
+    }
 
 
 @router.get(
@@ -195,12 +388,89 @@ async def get_all_ai_matchup_files(
     summary="Get file",
     response_model=File,
 )
-async def get_file(file_id: int, db: Session = Depends(get_db)):
-    file = db.query(models.File).filter_by(id=file_id).first()
+async def get_file(file_id: int, db: AsyncSession = Depends(get_db)):
+    file = await db.get(models.File, file_id)
 
     return file
 
 
+@router.get(
+    "/file/{file_id}/status",
+    dependencies=[Depends(is_token_expired)],
+    summary="Get file indexing status",
+    response_model=FileIndexStatus,
+)
+async def get_file_index_status(
+        file_id: int,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    file = (await db.scalars(select(models.File).filter_by(id=file_id, user_id=user_id))).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return FileIndexStatus(file_id=file.id, index_status=file.index_status)
+
+
+@router.get(
+    "/file/{file_id}/download-url",
+    dependencies=[Depends(is_token_expired)],
+    summary="Get presigned download URL",
+    response_model=DownloadURL,
+)
+async def get_file_download_url(
+        file_id: int,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    file = (await db.scalars(select(models.File).filter_by(id=file_id, user_id=user_id))).first()
+    if not file:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    # Signed locally, the bucket doesn't need to be public
+    return DownloadURL(url=presigned_get_url(file), expires_in=PRESIGNED_URL_EXPIRES)
+
+
+async def _acquire_blob(db: AsyncSession, digest: str, size: int) -> bool:
+    """
+    Adds a reference to the digest's blob, locking its row until the transaction ends.
+    Returns True if the blob had no references before, so the sweeper may have purged its object.
+    """
+    stmt = pg_insert(models.Blob).values(digest=digest, size=size, ref_count=1)
+    return await db.scalar(
+        stmt.on_conflict_do_update(
+            index_elements=[models.Blob.digest],
+            set_={"ref_count": models.Blob.ref_count + 1},
+        )
+        .returning(models.Blob.ref_count <= 1)
+    )
+
+
+async def _store_object(file: UploadFile, object_name: str, size: int) -> None:
+    try:
+        # Stream the spooled upload instead of reading it into memory
+        await file.seek(0)
+        await upload_to_minio_s3(file.file, object_name, length=size)
+    except S3Error as s3_error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"S3 Error - {str(s3_error)}"
+        )
+    except ServerError as serv_error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"MinIO Server Error - {str(serv_error)}"
+        )
+
+
+class _BlobPurged(Exception):
+    pass
+
+
 @router.post(
     "/file/upload",
     dependencies=[Depends(is_token_expired)],
@@ -209,55 +479,227 @@ async def get_file(file_id: int, db: Session = Depends(get_db)):
 )
 async def upload_file(
     file: UploadFile,
-    user_id: Annotated[str, Depends(is_authenticated)],
-    db: Session = Depends(get_db),
+    user_id: Annotated[int, Depends(is_authenticated)],
+    db: AsyncSession = Depends(get_db),
 ):
     try:
         file_name, file_ext = os.path.splitext(file.filename)
-        file_content = await file.read()
         if not file_ext:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Your file doesn't have an extension, please edit it."
             )
 
-        # Upload the file to storage minIO
-        try:
-            file_url = await upload_to_minio_s3(file_content, file.filename)
-        except S3Error as s3_error:
+        # Content address: identical files share one object under their digest
+        await file.seek(0)
+        digest, size = await hash_file(file.file)
+        object_name = blob_key(digest)
+
+        # Upload the file to storage minIO before the transaction, so no connection or
+        # row lock is held during the transfer. Concurrent uploads of the same content
+        # write the same bytes to the same key, overwriting each other is harmless.
+        # If the transaction fails the object stays, a re-upload overwrites it
+        for _ in range(2):
+            if await stat_object(object_name) is None:
+                await _store_object(file, object_name, size)
+
+            # Add file to PostgreSQL
+            try:
+                async with db.begin():
+                    # The sweeper may have purged an unreferenced blob since the check above,
+                    # it can't anymore once the row is locked: look once more, store it again if gone
+                    if await _acquire_blob(db, digest, size) and await stat_object(object_name) is None:
+                        raise _BlobPurged
+
+                    db_file = models.File(
+                        name=file_name,
+                        file=get_object_url(object_name),
+                        user_id=user_id,
+                        format=file_ext,
+                        digest=digest,
+                        search_vector=name_tsvector(file_name),
+                    )
+                    db.add(db_file)
+                    await db.flush() # add db_file.id to instance
+
+                    if file_ext in SUPPORTIVE_DOC_TYPES:
+                        # Text extraction and Pinecone upload run in ingestion workers,
+                        # client polls /file/{file_id}/status for the progress.
+                        # Duplicates of an indexed file reuse its vectors
+                        enqueue_file_indexing(db, db_file)
+            except _BlobPurged:
+                continue
+            break
+        else:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"S3 Error - {str(s3_error)}"
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Stored object was removed, please retry."
             )
-        except ServerError as serv_error:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"MinIO Server Error - {str(serv_error)}"
+
+        invalidate_user_search_results(user_id)
+        return db_file
+    except HTTPException:
+        # Already carries its status, e.g. 400 for a missing extension
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post(
+    "/file/upload-url",
+    dependencies=[Depends(is_token_expired)],
+    summary="Get presigned upload URLs",
+    response_model=PresignedUpload,
+)
+async def get_upload_url(
+        body: UploadRequest,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    _, file_ext = os.path.splitext(body.filename)
+    if not file_ext:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Your file doesn't have an extension, please edit it."
+        )
+
+    # Client sends the content straight to MinIO, the API only signs the requests
+    object_key = f"uploads/{user_id}/{uuid.uuid4().hex}{file_ext}"
+    upload_id = await create_multipart_upload(object_key) if body.parts > 1 else None
+
+    # Until completed the upload is tracked, so an abandoned one gets cleaned up
+    async with db.begin():
+        db.add(
+            models.PendingUpload(
+                object_key=object_key,
+                upload_id=upload_id,
+                expires_at=datetime.utcnow() + timedelta(seconds=UPLOAD_EXPIRY_SECONDS),
             )
+        )
+
+    if not upload_id:
+        return PresignedUpload(
+            object_key=object_key,
+            upload_id=None,
+            urls=[presigned_put_url(object_key)],
+            expires_in=PRESIGNED_URL_EXPIRES,
+        )
+
+    return PresignedUpload(
+        object_key=object_key,
+        upload_id=upload_id,
+        urls=[presigned_put_url(object_key, upload_id, part_number) for part_number in range(1, body.parts + 1)],
+        expires_in=PRESIGNED_URL_EXPIRES,
+    )
+
+
+async def _lock_pending_upload(db: AsyncSession, object_key: str) -> models.PendingUpload:
+    """Locks the upload against the sweeper until the transaction ends, raises if it's gone"""
+    upload = (
+        await db.scalars(
+            select(models.PendingUpload).filter_by(object_key=object_key).with_for_update()
+        )
+    ).first()
+    if upload:
+        return upload
+
+    if await db.scalar(select(models.File.id).filter_by(object_key=object_key)):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload has already been completed")
+    raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload has expired or been aborted")
+
+
+@router.post(
+    "/file/upload-complete",
+    dependencies=[Depends(is_token_expired)],
+    summary="Create file from a presigned upload",
+    response_model=File,
+)
+async def complete_upload(
+        body: CompleteUpload,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Keys are issued per user by /file/upload-url, nobody claims someone else's object
+    if not body.object_key.startswith(f"uploads/{user_id}/"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Object doesn't belong to the user")
+
+    file_name, file_ext = os.path.splitext(body.filename)
+    if not file_ext:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Your file doesn't have an extension, please edit it."
+        )
+
+    try:
+        if body.upload_id:
+            await complete_multipart_upload(
+                body.object_key, body.upload_id, [(part.part_number, part.etag) for part in body.parts]
+            )
+        uploaded = await stat_object(body.object_key)
+    except S3Error as s3_error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"S3 Error - {str(s3_error)}")
+    if not uploaded:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File hasn't been uploaded")
+
+    # Presigned uploads aren't hashed, reading them back would route the bytes
+    # through the API again. They keep their own object instead of a shared blob
+    try:
+        async with db.begin():
+            # The sweeper may have removed the object of an expired upload in the meantime
+            upload = await _lock_pending_upload(db, body.object_key)
+            await db.delete(upload)
 
-        # Add file to PostgreSQL
-        with db.begin():
             db_file = models.File(
                 name=file_name,
-                file=file_url,
-                user_id=int(user_id),
+                file=get_object_url(body.object_key),
+                user_id=user_id,
                 format=file_ext,
+                object_key=body.object_key,
+                search_vector=name_tsvector(file_name),
             )
             db.add(db_file)
-            db.flush() # add db_file.id to instance
+            await db.flush() # add db_file.id to instance
 
             if file_ext in SUPPORTIVE_DOC_TYPES:
-                # Add file to Pinecone
-                try:
-                    text = TextExtractor(file=file_content, file_ext=file_ext).extract()
-                    print(text)
-                    pc.upload_embeddings(text, str(db_file.id))
-                except Exception as e:
-                    # TODO: find a list of pinecone exceptions
-                    db.rollback()
-                    delete_file_from_minio_s3(db_file)
-                    raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+                enqueue_file_indexing(db, db_file)
+    except IntegrityError:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload has already been completed")
 
-        return db_file
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    invalidate_user_search_results(user_id)
+    return db_file
+
+
+@router.post(
+    "/file/upload-abort",
+    dependencies=[Depends(is_token_expired)],
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Abort a presigned upload",
+)
+async def abort_upload(
+        body: AbortUpload,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    if not body.object_key.startswith(f"uploads/{user_id}/"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Object doesn't belong to the user")
+
+    try:
+        async with db.begin():
+            upload = await _lock_pending_upload(db, body.object_key)
+            # Storage goes first: if it fails the upload stays for the sweeper
+            if upload.upload_id:
+                await abort_multipart_upload(upload.object_key, upload.upload_id)
+            await delete_object(upload.object_key)
+            await db.delete(upload)
+    except S3Error as s3_error:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"S3 Error - {str(s3_error)}"
+        )
 
 
 @router.delete(
@@ -268,21 +710,19 @@ async def upload_file(
 )
 async def delete_file(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if file_id:
-        file_to_delete = db.query(models.File).filter_by(id=file_id).first()
+        file_to_delete = await db.get(models.File, file_id)
         if not file_to_delete:
             raise HTTPException(status_code=404, detail="File not found")
 
         file_to_delete.should_delete = True
-        db.commit()
-        db.refresh(file_to_delete)
-
-        job_id = await schedule_file_deletion(db, file_to_delete)
-        job_instance = models.ScheduledJob(file_id=file_id, job_id=job_id)
-        db.add(job_instance)
-        db.commit()
+        # Flag and deletion job commit together, so a trashed file is never left unscheduled
+        schedule_file_deletion(db, file_to_delete)
+        await db.commit()
+        await db.refresh(file_to_delete)
+        invalidate_user_search_results(file_to_delete.user_id)
 
     else:
         raise HTTPException(status_code=400, detail="file_id is None")
@@ -298,32 +738,27 @@ async def delete_file(
 )
 async def restore_file(
     file_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     if file_id:
-        file_to_restore = db.query(models.File).filter_by(id=file_id).first()
+        file_to_restore = await db.get(models.File, file_id)
         if not file_to_restore:
             raise HTTPException(status_code=404, detail="File not found")
 
-        file_to_restore.should_delete = False
-        db.commit()
-        db.refresh(file_to_restore)
-
-        # running_jobs = scheduler.get_jobs()
-        # job_lst = []
-        # for job in running_jobs:
-        #     job_lst.append(job.id)
-
-        # Terminate and delete deleting file cron job
-        cron = db.query(models.ScheduledJob).filter_by(file_id=file_id).first()
+        # Drop the pending deletion job in the same transaction. The job row goes
+        # first, the order the sweeper locks rows in, so a restore racing a purge
+        # waits for it instead of deadlocking
+        cron = (await db.scalars(select(models.ScheduledJob).filter_by(file_id=file_id))).first()
         if cron:
-            scheduler.remove_job(str(cron.job_id).replace("-", ""))
+            await db.delete(cron)
+            await db.flush()
 
-            print("Job has been removed successfully")
+        file_to_restore.should_delete = False
+        await db.commit()
+        await db.refresh(file_to_restore)
+        invalidate_user_search_results(file_to_restore.user_id)
 
-            db.delete(cron)
-            db.commit()
-        else:
+        if not cron:
             raise HTTPException(status_code=404, detail="Cron not found")
 
     else:
@@ -332,6 +767,131 @@ async def restore_file(
     return file_to_restore
 
 
+def _id_in(column, ids: list[int]):
+    # One array parameter, whatever the number of ids, so asyncpg reuses a single prepared statement
+    return column == any_(literal(ids, ARRAY(Integer)))
+
+
+async def _restore_files(db: AsyncSession, user_id: int, *criteria) -> list[models.File]:
+    trashed = select(models.File.id).filter(
+        models.File.user_id == user_id,
+        models.File.should_delete == true(),
+        *criteria,
+    )
+    # Job rows go first, the order the sweeper locks rows in
+    await db.execute(delete(models.ScheduledJob).where(models.ScheduledJob.file_id.in_(trashed)))
+    files = (await db.scalars(
+        update(models.File)
+        .where(models.File.id.in_(trashed))
+        .values(should_delete=False)
+        .returning(models.File)
+    )).all()
+    await db.commit()
+
+    if files:
+        invalidate_user_search_results(user_id)
+    return files
+
+
+@router.post(
+    "/files/delete",
+    dependencies=[Depends(is_token_expired)],
+    summary="Delete files",
+    response_model=list[File],
+)
+async def delete_files(
+        body: FileIDs,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Files already in the trash keep their original deletion job
+    files = (await db.scalars(
+        update(models.File)
+        .where(
+            _id_in(models.File.id, body.file_ids),
+            models.File.user_id == user_id,
+            models.File.should_delete == false(),
+        )
+        .values(should_delete=True)
+        .returning(models.File)
+    )).all()
+    await schedule_files_deletion(db, [file.id for file in files])
+    await db.commit()
+
+    if files:
+        invalidate_user_search_results(user_id)
+    return files
+
+
+@router.patch(
+    "/files/restore",
+    dependencies=[Depends(is_token_expired)],
+    summary="Restore files",
+    response_model=list[File],
+)
+async def restore_files(
+        body: FileIDs,
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    return await _restore_files(db, user_id, _id_in(models.File.id, body.file_ids))
+
+
+@router.patch(
+    "/deleted/restore",
+    dependencies=[Depends(is_token_expired)],
+    summary="Restore all deleted files",
+    response_model=list[File],
+)
+async def restore_all_deleted(
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    return await _restore_files(db, user_id)
+
+
+@router.delete(
+    "/deleted",
+    dependencies=[Depends(is_token_expired)],
+    summary="Empty trash",
+    response_model=list[File],
+)
+async def empty_trash(
+        db: AsyncSession = Depends(get_db),
+        user_id: int | None = Depends(is_authenticated)
+):
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    # Deletion jobs become due right away, the sweeper purges them on its next pass
+    file_ids = (await db.scalars(
+        update(models.ScheduledJob)
+        .where(
+            models.ScheduledJob.file_id.in_(
+                select(models.File.id).filter(
+                    models.File.user_id == user_id,
+                    models.File.should_delete == true(),
+                )
+            )
+        )
+        .values(run_at=datetime.utcnow())
+        .returning(models.ScheduledJob.file_id)
+    )).all()
+    files = (await db.scalars(select(models.File).where(_id_in(models.File.id, list(file_ids))))).all()
+    await db.commit()
+
+    return files
+
+
 @router.post(
     "/favorites/add",
     dependencies=[Depends(is_token_expired), Depends(is_authenticated)],
@@ -340,19 +900,19 @@ async def restore_file(
 )
 async def add_to_favorites(
     file: FileID,
-    user_id: Annotated[str, Depends(is_authenticated)],
-    db: Session = Depends(get_db),
+    user_id: Annotated[int, Depends(is_authenticated)],
+    db: AsyncSession = Depends(get_db),
 ):
     if file:
-        db_file = db.query(models.File).filter_by(id=file.file_id).first()
+        db_file = await db.get(models.File, file.file_id)
         if not db_file:
             raise HTTPException(status_code=404, detail="File not found")
 
-        is_fav = db.query(models.Favorite).filter_by(file_id=file.file_id).first()
+        is_fav = (await db.scalars(select(models.Favorite).filter_by(file_id=file.file_id))).first()
 
         if is_fav:
-            db.delete(is_fav)
-            db.commit()
+            await db.delete(is_fav)
+            await db.commit()
 
             return Favorite(
                 id=is_fav.id,
@@ -361,10 +921,10 @@ async def add_to_favorites(
                 fav=False,
             )
 
-        favorite = models.Favorite(user_id=int(user_id), file_id=file.file_id)
+        favorite = models.Favorite(user_id=user_id, file_id=file.file_id)
         db.add(favorite)
-        db.commit()
-        db.refresh(favorite)
+        await db.commit()
+        await db.refresh(favorite)
     else:
         raise HTTPException(status_code=400, detail="file_id is None")
 
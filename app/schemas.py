@@ -1,7 +1,8 @@
 import uuid
 from datetime import datetime
+from typing import Generic, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class File(BaseModel):
@@ -11,6 +12,9 @@ class File(BaseModel):
     user_id: int
     format: str
     should_delete: bool
+    index_status: str | None = None
+    digest: str | None = None
+    object_key: str | None = None
     created_at: datetime | None
     updated_at: datetime | None
 
@@ -18,6 +22,11 @@ class File(BaseModel):
         from_attributes = True
 
 
+class FileIndexStatus(BaseModel):
+    file_id: int
+    index_status: str | None
+
+
 class Favorite(BaseModel):
     id: int
     user_id: int
@@ -36,5 +45,58 @@ class FilesFavorite(Files):
     fav: bool
 
 
+class ScoredFile(FilesFavorite):
+    score: float
+
+
 class FileID(BaseModel):
     file_id: int
+
+
+class FileIDs(BaseModel):
+    file_ids: list[int] = Field(min_length=1, max_length=1000)
+
+
+class UploadRequest(BaseModel):
+    filename: str
+    # More than one makes it a multipart upload, every part but the last must be at least 5 MiB
+    parts: int = Field(1, ge=1, le=10000)
+
+
+class PresignedUpload(BaseModel):
+    object_key: str
+    upload_id: str | None
+    # PUT the content to urls[0], or part n to urls[n - 1] of a multipart upload
+    urls: list[str]
+    expires_in: int
+
+
+class UploadedPart(BaseModel):
+    part_number: int = Field(ge=1, le=10000)
+    # ETag header of the part's PUT response
+    etag: str
+
+
+class CompleteUpload(BaseModel):
+    object_key: str
+    filename: str
+    upload_id: str | None = None
+    parts: list[UploadedPart] = []
+
+
+class AbortUpload(BaseModel):
+    object_key: str
+
+
+class DownloadURL(BaseModel):
+    url: str
+    expires_in: int
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: list[T]
+    # Pass as ?cursor= to get the next page, None on the last one
+    next_cursor: str | None
@@ -0,0 +1,83 @@
+from sqlalchemy import ColumnElement, cast, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import REGCONFIG, TSVECTOR
+
+from app import models
+from app.config import FULLTEXT_CONFIG, FULLTEXT_MAX_CHARS, HYBRID_RRF_K
+
+# Values of the /search mode parameter
+MODE_SUBSTRING = "substring"
+MODE_SIMILARITY = "similarity"
+MODE_FULLTEXT = "fulltext"
+
+
+def _config() -> ColumnElement:
+    return cast(FULLTEXT_CONFIG, REGCONFIG)
+
+
+def name_tsvector(name: str) -> ColumnElement:
+    """files.search_vector of a file without extracted text"""
+    return func.setweight(func.to_tsvector(_config(), name), "A")
+
+
+def document_tsvector(name: str, text: str) -> ColumnElement:
+    """files.search_vector with document text, the name weighs more"""
+    # tsvector is limited to 1MB, only the beginning of long documents is indexed
+    return name_tsvector(name).op("||")(
+        func.setweight(func.to_tsvector(_config(), text[:FULLTEXT_MAX_CHARS]), "B")
+    )
+
+
+def copied_tsvector(name: str, source_id: int) -> ColumnElement:
+    """files.search_vector with the document text of another file of the same content"""
+    source = select(models.File.search_vector).where(models.File.id == source_id).scalar_subquery()
+    # Weight B lexemes are the text, the name is this file's own
+    text = func.coalesce(func.ts_filter(source, literal_column("'{b}'")), cast("", TSVECTOR))
+    return name_tsvector(name).op("||")(text)
+
+
+def name_matches(q: str) -> ColumnElement:
+    """Case-insensitive substring match, served by the lower(name) trigram index"""
+    return func.lower(models.File.name).contains(q.lower(), autoescape=True)
+
+
+def name_similar(q: str) -> ColumnElement:
+    # pg_trgm "%" is true above pg_trgm.similarity_threshold, index-assisted
+    return func.lower(models.File.name).op("%")(q.lower())
+
+
+def name_similarity(q: str) -> ColumnElement:
+    return func.similarity(func.lower(models.File.name), q.lower())
+
+
+def fulltext_matches(q: str) -> ColumnElement:
+    return models.File.search_vector.op("@@")(func.websearch_to_tsquery(_config(), q))
+
+
+def fulltext_rank(q: str) -> ColumnElement:
+    return func.ts_rank(models.File.search_vector, func.websearch_to_tsquery(_config(), q))
+
+
+def keyword_matches(q: str) -> ColumnElement:
+    """Keyword side of hybrid search: document text or name"""
+    return or_(fulltext_matches(q), name_matches(q))
+
+
+def keyword_rank(q: str) -> ColumnElement:
+    # Name-only matches have no ts_rank, similarity orders them
+    return fulltext_rank(q) + name_similarity(q)
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = HYBRID_RRF_K) -> list[tuple[int, float]]:
+    """
+    Fuses ranked lists of file ids: score(file) = sum of 1 / (k + rank) over
+    the lists it's in, rank starts at 1. Plain ranks are used, so scores of
+    different scales (ts_rank, cosine) don't need normalizing.
+    Returns:
+        list: (file_id, score) pairs, best first.
+    """
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, file_id in enumerate(ranking, start=1):
+            scores[file_id] = scores.get(file_id, 0.0) + 1.0 / (k + rank)
+
+    return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
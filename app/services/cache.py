@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.config import (
+    QUERY_EMBEDDING_CACHE_SIZE,
+    SEARCH_RESULTS_CACHE_SIZE,
+    SEARCH_RESULTS_CACHE_TTL,
+)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with least-recently-used eviction and
+    optional per-entry TTL. Thread-safe, since ingestion workers
+    invalidate entries from their own threads.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and (self.ttl is None or self.ttl > 0)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drops every entry whose key matches predicate, returns the count"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+# Query text -> embedding, embeddings never go stale
+query_embedding_cache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+
+# (user_id, query) -> matched file ids. Invalidation is per process,
+# so TTL bounds staleness when several workers are running.
+search_results_cache = LRUCache(maxsize=SEARCH_RESULTS_CACHE_SIZE, ttl=SEARCH_RESULTS_CACHE_TTL)
+
+
+def invalidate_user_search_results(user_id: int) -> None:
+    search_results_cache.invalidate(lambda key: key[0] == user_id)
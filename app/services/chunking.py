@@ -0,0 +1,236 @@
+import json
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from app.config import EMBEDDING_MODEL, CHUNK_STRATEGY, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+if TYPE_CHECKING:
+    from tokenizers import Tokenizer
+
+CHUNK_SIZE = 1050
+CHUNK_OVERLAP = 50
+
+# Extractors separate paragraphs, pages and slides with an empty line
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    Splits streamed text into chunks of chunk_size characters, each starting
+    overlap characters before the end of the previous one.
+    Only the unfinished chunk is buffered, whatever the length of the text.
+    Args:
+        pieces: Text in consecutive pieces, e.g. pages or paragraphs.
+    """
+    buffer = ""
+    emitted = False
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= chunk_size:
+            yield buffer[:chunk_size]
+            emitted = True
+            buffer = buffer[chunk_size - overlap:]
+
+    # Rest is only the overlap of the last chunk if no text came after it
+    if buffer and (not emitted or len(buffer) > overlap):
+        yield buffer
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _hub_name(model_name: str) -> str:
+    # Short sentence-transformers names live under their organization on the hub
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+@lru_cache(maxsize=None)
+def load_tokenizer(model_name: str = EMBEDDING_MODEL) -> "Tokenizer":
+    """Tokenizer of the embedding model, without loading the model (or torch) itself"""
+    from tokenizers import Tokenizer
+
+    tokenizer = Tokenizer.from_pretrained(_hub_name(model_name))
+    # Counting must see every token, the model truncates on its own
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer
+
+
+@lru_cache(maxsize=None)
+def load_max_seq_length(model_name: str = EMBEDDING_MODEL) -> int:
+    """
+    Tokens the embedding model reads per text, from its configuration on the
+    hub, so it's known without loading the model. SentenceTransformer
+    truncates to max_seq_length, which is often below the tokenizer's limit.
+    """
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.utils import EntryNotFoundError
+
+    candidates = (("sentence_bert_config.json", "max_seq_length"), ("tokenizer_config.json", "model_max_length"))
+    for filename, key in candidates:
+        try:
+            with open(hf_hub_download(_hub_name(model_name), filename)) as f:
+                config = json.load(f)
+        except EntryNotFoundError:
+            continue
+        if key in config:
+            return int(config[key])
+    raise ValueError(f"Max sequence length of {model_name} is unknown, set CHUNK_MAX_TOKENS")
+
+
+class Chunker(ABC):
+    """Chunking strategy, turns streamed document text into chunks to embed"""
+
+    @abstractmethod
+    def chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        ...
+
+
+class FixedChunker(Chunker):
+    """Fixed character windows, blind to tokens and sentences"""
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        return iter_chunks((piece.replace("\n", " ") for piece in pieces), self.chunk_size, self.overlap)
+
+
+class SentenceChunker(Chunker):
+    """
+    Packs whole sentences into chunks of at most max_tokens model tokens
+    (by default the embedding model's max sequence length), so nothing is
+    cut off by the model. A chunk ends at
+    a paragraph end once it's at least half full, and starts with the last
+    sentences of the previous chunk, up to overlap_tokens.
+    Sentences longer than a chunk are split at token boundaries.
+    """
+
+    # An unfinished paragraph is split into sentences once it gets this long
+    max_buffer = 100_000
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        tokenizer: "Tokenizer | None" = None,
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._tokenizer = tokenizer
+        self._budget: int | None = None
+
+    @property
+    def budget(self) -> int:
+        """Tokens of text a chunk may hold"""
+        if self._budget is None:
+            # [CLS] and [SEP] take two positions of the sequence
+            self._budget = (self.max_tokens or load_max_seq_length()) - 2
+        return self._budget
+
+    @property
+    def tokenizer(self) -> "Tokenizer":
+        if self._tokenizer is None:
+            self._tokenizer = load_tokenizer()
+        return self._tokenizer
+
+    def _paragraphs(self, pieces: Iterable[str]) -> Iterator[tuple[list[str], bool]]:
+        """Yields sentences of the text with whether they end a paragraph"""
+        buffer = ""
+        for piece in pieces:
+            buffer += piece
+            *paragraphs, buffer = _PARAGRAPH_BREAK.split(buffer)
+            for paragraph in paragraphs:
+                yield _split_sentences(paragraph), True
+
+            if len(buffer) > self.max_buffer:
+                # Keep the last, possibly unfinished, sentence for the next piece
+                *sentences, buffer = _SENTENCE_END.split(buffer)
+                if not sentences:
+                    sentences, buffer = [buffer], ""
+                yield [sentence for sentence in map(_normalize, sentences) if sentence], False
+
+        yield _split_sentences(buffer), True
+
+    def _measure(self, sentences: list[str]) -> Iterator[tuple[str, int]]:
+        """Yields sentences with their token counts, over-long ones in budget-sized parts"""
+        encodings = self.tokenizer.encode_batch(sentences, add_special_tokens=False)
+        for sentence, encoding in zip(sentences, encodings):
+            tokens = len(encoding.ids)
+            if tokens <= self.budget:
+                yield sentence, tokens
+                continue
+            offsets = encoding.offsets
+            for start in range(0, tokens, self.budget):
+                end = min(start + self.budget, tokens)
+                yield sentence[offsets[start][0]:offsets[end - 1][1]], end - start
+
+    def _overlap(self, sentences: list[tuple[str, int]]) -> list[tuple[str, int]]:
+        kept: list[tuple[str, int]] = []
+        size = 0
+        for sentence, tokens in reversed(sentences):
+            if size + tokens > self.overlap_tokens:
+                break
+            kept.append((sentence, tokens))
+            size += tokens
+        return kept[::-1]
+
+    def chunks(self, pieces: Iterable[str]) -> Iterator[str]:
+        current: list[tuple[str, int]] = []
+        size = 0
+        # Sentences of current that aren't just overlap from the previous chunk
+        fresh = 0
+        for sentences, paragraph_end in self._paragraphs(pieces):
+            if not sentences:
+                continue
+            for sentence, tokens in self._measure(sentences):
+                if size + tokens > self.budget:
+                    if fresh:
+                        yield " ".join(text for text, _ in current)
+                        current = self._overlap(current)
+                        size = sum(count for _, count in current)
+                        fresh = 0
+                    # Overlap, carried over here or from a paragraph end, gives way
+                    # to a sentence it leaves no room for
+                    if size + tokens > self.budget:
+                        current, size = [], 0
+                current.append((sentence, tokens))
+                size += tokens
+                fresh += 1
+
+            if paragraph_end and fresh and size >= self.budget // 2:
+                yield " ".join(text for text, _ in current)
+                current = self._overlap(current)
+                size = sum(count for _, count in current)
+                fresh = 0
+
+        if fresh:
+            yield " ".join(text for text, _ in current)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in _SENTENCE_END.split(_normalize(text)) if sentence]
+
+
+CHUNKERS: dict[str, type[Chunker]] = {
+    "fixed": FixedChunker,
+    "sentence": SentenceChunker,
+}
+
+
+def get_chunker(strategy: str = CHUNK_STRATEGY) -> Chunker:
+    if strategy not in CHUNKERS:
+        raise ValueError(f"Unsupported chunking strategy: {strategy}")
+    return CHUNKERS[strategy]()
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from app.config import EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_BATCH_WINDOW_MS
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+class EmbeddingService:
+    """
+    Owns the SentenceTransformer model. All encoding runs on one dedicated
+    thread, so CPU-bound forward passes never block the event loop.
+    Concurrent query encodes are collected for a short window and
+    encoded together as one batch.
+    The model (and torch with it) is loaded on first use, not on import.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        batch_window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+    ):
+        self.model_name = model_name
+        self._model: "SentenceTransformer | None" = None
+        self._model_lock = threading.Lock()
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        self._queue: asyncio.Queue | None = None
+        self._collector: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def model(self) -> "SentenceTransformer":
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def warm_up(self) -> None:
+        """Loads the model and runs one forward pass, so the first request doesn't pay for it"""
+        self.encode_documents(["warm up"])
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+    def encode_documents(self, texts: list[str]) -> np.ndarray:
+        """
+        Blocking encode for code running outside the event loop (ingestion workers).
+        Returns:
+            np.ndarray: (len(texts), dimension) float32 matrix.
+        """
+        return self._executor.submit(self._encode, texts).result()
+
+    async def encode_query(self, text: str) -> np.ndarray:
+        self._ensure_collector()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    def _ensure_collector(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._collector is None or self._collector.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._collector = loop.create_task(self._collect())
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests arriving while this batch is encoded make up the next one
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor, self._encode, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                # Caller may have been cancelled while waiting
+                if not future.done():
+                    future.set_result(embedding)
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,138 @@
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator
+
+from app.config import (
+    EXTRACTION_WORKERS,
+    EXTRACTION_TIMEOUT,
+    EXTRACTION_FORMAT_TIMEOUTS,
+    EXTRACTION_MEMORY_LIMIT_MB,
+    EXTRACTION_MAX_TASKS_PER_CHILD,
+    FULLTEXT_MAX_CHARS,
+)
+from app.services.chunking import get_chunker
+from app.services.text_extractor import TextExtractor
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _init_worker(memory_limit: int) -> None:
+    if memory_limit:
+        import resource
+
+        # Allocations beyond the limit raise MemoryError in the worker
+        # instead of growing until the OOM killer picks a process
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _extract_chunks(path: str, file_ext: str, chunks_path: str, prefix_chars: int) -> tuple[int, str]:
+    count = 0
+    prefix: list[str] = []
+    prefix_length = 0
+
+    def capture_prefix(pieces: Iterable[str]) -> Iterator[str]:
+        nonlocal prefix_length
+        for piece in pieces:
+            if prefix_length < prefix_chars:
+                prefix.append(piece[:prefix_chars - prefix_length])
+                prefix_length += len(prefix[-1])
+            yield piece
+
+    try:
+        with open(path, "rb") as file, open(chunks_path, "w") as out:
+            pieces = capture_prefix(TextExtractor(file=file, file_ext=file_ext).iter_text())
+            for chunk in get_chunker().chunks(pieces):
+                out.write(json.dumps(chunk) + "\n")
+                count += 1
+    except Exception as e:
+        # Parser exceptions may not survive pickling back to the parent
+        raise ValueError(f"Failed to extract text: {str(e)}") from None
+
+    return count, "".join(prefix)
+
+
+class ExtractionPool:
+    """
+    Parses documents in worker processes, so a parser holding the GIL or
+    running away with memory never stalls the API process.
+    Every calling thread (ingestion worker) has a process of its own, spawned
+    on first use and replaced after max_tasks_per_child documents, so a timed
+    out or crashed document only takes down its own process. At most
+    `workers` documents are parsed at once, the others wait for a slot.
+    """
+
+    def __init__(
+        self,
+        workers: int = EXTRACTION_WORKERS,
+        memory_limit_mb: int = EXTRACTION_MEMORY_LIMIT_MB,
+        max_tasks_per_child: int = EXTRACTION_MAX_TASKS_PER_CHILD,
+    ):
+        self.workers = workers
+        self.memory_limit = memory_limit_mb * 1024 * 1024
+        self.max_tasks_per_child = max_tasks_per_child
+        self._slots = threading.BoundedSemaphore(workers)
+        self._local = threading.local()
+        self._pools: set[ProcessPoolExecutor] = set()
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        pool = getattr(self._local, "pool", None)
+        if pool is None:
+            pool = ProcessPoolExecutor(
+                max_workers=1,
+                # Forking a process with running threads and open connections isn't safe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.memory_limit,),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+            self._local.pool = pool
+            with self._lock:
+                self._pools.add(pool)
+        return pool
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        self._local.pool = None
+        with self._lock:
+            self._pools.discard(pool)
+        # Executor can't cancel a running call, stop its process instead
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def extract_chunks(self, path: str, file_ext: str, chunks_path: str) -> tuple[int, str]:
+        """
+        Blocking, streams text of the document at path through the
+        CHUNK_STRATEGY chunker into chunks_path, one JSON string per line.
+        Memory use doesn't grow with the length of the document.
+        Returns:
+            tuple: Number of chunks, and the first FULLTEXT_MAX_CHARS characters of the text.
+        """
+        timeout = EXTRACTION_FORMAT_TIMEOUTS.get(file_ext.lower(), EXTRACTION_TIMEOUT)
+        # Waiting for a slot doesn't count toward the timeout, only parsing does
+        with self._slots:
+            pool = self._get_pool()
+            future = pool.submit(_extract_chunks, path, file_ext, chunks_path, FULLTEXT_MAX_CHARS)
+            try:
+                return future.result(timeout=timeout)
+            except TimeoutError:
+                self._discard(pool)
+                raise ExtractionTimeout(f"Extraction of {file_ext} took longer than {timeout:.0f}s")
+            except BrokenProcessPool:
+                # Worker died, e.g. killed for memory
+                self._discard(pool)
+                raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, set()
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+extraction_pool = ExtractionPool()
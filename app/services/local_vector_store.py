@@ -0,0 +1,313 @@
+import fcntl
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+
+from app.config import LOCAL_VECTOR_STORE_PATH, EMBEDDING_DIMENSION
+from app.services.vector_store import VectorStore
+
+# Data files of a generation: vectors.f32 / log.jsonl for generation 0 (the
+# layout before generations), vectors.<n>.f32 / log.<n>.jsonl after that
+_DATA_FILE = re.compile(r"^(vectors|log)(?:\.(\d+))?\.(f32|jsonl)$")
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process exact nearest-neighbour index for offline runs and benchmarks.
+
+    Layout of the store directory:
+        manifest.json      - {"generation": n}, the current pair of data files
+        vectors[.n].f32    - L2-normalized float32 rows, appended and memory-mapped
+        log[.n].jsonl      - append-only log of upserts ({"row", "id", "metadata"})
+                             and deletes ({"delete": [rows]}), replayed on load
+        lock               - flock target, writers hold it exclusively, readers shared
+    Deleted rows are only marked dead; once dead rows outnumber live ones the
+    live rows are written to the next generation, which the manifest switches
+    to in one atomic rename, so a crash leaves either generation intact.
+    Several processes (uvicorn workers) may share the directory: every call
+    first replays what the others appended, or reloads after their compaction.
+    """
+
+    manifest_file = "manifest.json"
+    lock_file = "lock"
+
+    def __init__(self, path: str = LOCAL_VECTOR_STORE_PATH, dimension: int = EMBEDDING_DIMENSION):
+        self.path = path
+        self.dimension = dimension
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, self.lock_file), os.O_RDWR | os.O_CREAT, 0o644)
+        self._generation = -1
+        with self._locked(exclusive=True):
+            # Files of a compaction that crashed before or after the switch
+            self._remove_stale_files()
+
+    def _file_path(self, kind: str, generation: int | None = None) -> str:
+        generation = self._generation if generation is None else generation
+        extension = "f32" if kind == "vectors" else "jsonl"
+        name = f"{kind}.{extension}" if generation == 0 else f"{kind}.{generation}.{extension}"
+        return os.path.join(self.path, name)
+
+    @property
+    def _vectors_path(self) -> str:
+        return self._file_path("vectors")
+
+    @property
+    def _log_path(self) -> str:
+        return self._file_path("log")
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, self.manifest_file)
+
+    def _read_generation(self) -> int:
+        try:
+            with open(self._manifest_path) as f:
+                return json.load(f)["generation"]
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False) -> Iterator[None]:
+        """Serializes threads, then processes, and brings the in-memory index up to date"""
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        generation = self._read_generation()
+        if generation != self._generation:
+            # Another process compacted, or first load
+            self._generation = generation
+            self._load()
+        elif self._log_offset != (os.path.getsize(self._log_path) if os.path.exists(self._log_path) else 0):
+            # Another process appended
+            self._replay_log()
+            self._remap()
+
+    def _remove_stale_files(self) -> None:
+        for name in os.listdir(self.path):
+            match = _DATA_FILE.match(name)
+            if name.endswith(".tmp") or (match and int(match.group(2) or 0) != self._generation):
+                os.remove(os.path.join(self.path, name))
+
+    def _load(self) -> None:
+        self._dead_mask: np.ndarray | None = None
+        self._ids: list[str | None] = []
+        self._metadata: list[dict | None] = []
+        self._rows_by_id: dict[str, int] = {}
+        self._rows_by_doc: dict[str, set[int]] = {}
+        self._rows_by_user: dict[int, set[int]] = {}
+        self._log_offset = 0
+
+        self._replay_log()
+        self._remap()
+        # Log entries whose vectors never reached the vectors file are dropped
+        self._mark_deleted(list(range(len(self._vectors), len(self._ids))))
+        self._ids = self._ids[:len(self._vectors)]
+        self._metadata = self._metadata[:len(self._vectors)]
+
+    def _replay_log(self) -> None:
+        """Applies log entries from where the last replay or write stopped"""
+        if not os.path.exists(self._log_path):
+            return
+        with open(self._log_path, "rb") as log:
+            log.seek(self._log_offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # Torn last line after a crash
+                    break
+                entry = json.loads(line)
+                if "delete" in entry:
+                    self._mark_deleted(entry["delete"])
+                else:
+                    self._add_row(entry["row"], entry["id"], entry["metadata"])
+                self._log_offset += len(line)
+
+    def _remap(self) -> None:
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        rows = min(size // (4 * self.dimension), len(self._ids))
+        if rows:
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension)
+            )
+        else:
+            self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+
+    def _add_row(self, row: int, vector_id: str, metadata: dict) -> None:
+        self._dead_mask = None
+        if vector_id in self._rows_by_id:
+            self._mark_deleted([self._rows_by_id[vector_id]])
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._metadata.append(None)
+        self._ids[row] = vector_id
+        self._metadata[row] = metadata
+        self._rows_by_id[vector_id] = row
+        self._rows_by_doc.setdefault(metadata["doc_id"], set()).add(row)
+        self._rows_by_user.setdefault(metadata.get("user_id"), set()).add(row)
+
+    def _mark_deleted(self, rows: list[int]) -> None:
+        self._dead_mask = None
+        for row in rows:
+            vector_id = self._ids[row]
+            if vector_id is None:
+                continue
+            metadata = self._metadata[row]
+            for rows_by_key, key in (
+                (self._rows_by_doc, metadata["doc_id"]),
+                (self._rows_by_user, metadata.get("user_id")),
+            ):
+                key_rows = rows_by_key.get(key)
+                if key_rows is not None:
+                    key_rows.discard(row)
+                    if not key_rows:
+                        del rows_by_key[key]
+            del self._rows_by_id[vector_id]
+            self._ids[row] = None
+            self._metadata[row] = None
+
+    def _append_log(self, entries: list[dict]) -> None:
+        with open(self._log_path, "ab") as log:
+            log.writelines((json.dumps(entry) + "\n").encode() for entry in entries)
+            log.flush()
+            os.fsync(log.fileno())
+            # Held exclusively, nobody else wrote in between
+            self._log_offset = log.tell()
+
+    def upsert(
+        self, document_id: str, user_id: int, chunks: list[str], embeddings: np.ndarray, first_chunk: int = 0
+    ) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._locked(exclusive=True):
+            if first_chunk == 0:
+                # Re-indexing replaces the whole document, including chunks beyond the new count
+                self._delete([document_id])
+
+            # Every process has replayed the whole log under the lock, so this is the log's row count
+            first_row = len(self._ids)
+            with open(self._vectors_path, "ab") as f:
+                # Drop rows left over from an interrupted upsert
+                f.truncate(first_row * 4 * self.dimension)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            entries = [
+                {
+                    "row": first_row + i,
+                    "id": f"{document_id}_{first_chunk + i}",
+                    "metadata": {"text": chunk, "doc_id": document_id, "user_id": user_id},
+                }
+                for i, chunk in enumerate(chunks)
+            ]
+            self._append_log(entries)
+            for entry in entries:
+                self._add_row(entry["row"], entry["id"], entry["metadata"])
+            self._remap()
+            self._maybe_compact()
+
+    def query(self, embedding: np.ndarray, top_k: int, user_id: int | None = None) -> list[dict]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        # Cosine similarity as a dot product, rows are normalized on insert
+        with self._locked():
+            if user_id is not None:
+                # Score only the user's rows instead of filtering afterwards
+                rows = np.fromiter(self._rows_by_user.get(user_id, ()), dtype=np.int64)
+                if not len(rows):
+                    return []
+                scores = np.asarray(self._vectors[rows] @ query)
+            else:
+                if not self._rows_by_id:
+                    return []
+                if self._dead_mask is None:
+                    self._dead_mask = np.fromiter(
+                        (vector_id is None for vector_id in self._ids), dtype=bool, count=len(self._ids)
+                    )
+                rows = np.arange(len(self._ids))
+                scores = np.asarray(self._vectors @ query)
+                scores[self._dead_mask] = -np.inf
+
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {"id": self._ids[rows[i]], "score": float(scores[i]), "metadata": self._metadata[rows[i]]}
+                for i in top
+                if self._ids[rows[i]] is not None
+            ]
+
+    def fetch_document(self, document_id: str) -> tuple[list[str], np.ndarray]:
+        with self._locked():
+            # Ids are "{document_id}_{chunk_number}"
+            rows = sorted(
+                self._rows_by_doc.get(document_id, ()),
+                key=lambda row: int(self._ids[row].rsplit("_", 1)[1]),
+            )
+            chunks = [self._metadata[row]["text"] for row in rows]
+            return chunks, np.array(self._vectors[rows], dtype=np.float32)
+
+    def delete(self, document_ids: list[str]) -> None:
+        with self._locked(exclusive=True):
+            self._delete(document_ids)
+
+    def _delete(self, document_ids: list[str]) -> None:
+        rows = sorted(
+            row for document_id in document_ids for row in self._rows_by_doc.get(document_id, ())
+        )
+        if not rows:
+            return
+
+        self._append_log([{"delete": rows}])
+        self._mark_deleted(rows)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        alive = len(self._rows_by_id)
+        dead = len(self._ids) - alive
+        if dead < 1000 or dead < alive:
+            return
+
+        rows = sorted(self._rows_by_id.values())
+        generation = self._generation + 1
+        with open(self._file_path("vectors", generation), "wb") as f:
+            for start in range(0, len(rows), 4096):
+                f.write(np.ascontiguousarray(self._vectors[rows[start:start + 4096]]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._file_path("log", generation), "w") as log:
+            for new_row, row in enumerate(rows):
+                log.write(json.dumps({"row": new_row, "id": self._ids[row], "metadata": self._metadata[row]}) + "\n")
+            log.flush()
+            os.fsync(log.fileno())
+
+        # The switch: until the rename the old generation is current, after it the new one
+        manifest_tmp = self._manifest_path + ".tmp"
+        with open(manifest_tmp, "w") as f:
+            json.dump({"generation": generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(manifest_tmp, self._manifest_path)
+        directory = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+        self._generation = generation
+        self._load()
+        self._remove_stale_files()
@@ -1,37 +1,291 @@
-import io
+import asyncio
+import hashlib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from tempfile import NamedTemporaryFile
+from typing import BinaryIO
+from urllib.parse import quote
+
+import urllib3
+
 from app.config import (
     MINIO_HOSTNAME,
     MINIO_ACCESS_KEY,
     MINIO_SECRET_KEY,
     MINIO_BUCKET,
+    MINIO_PART_SIZE,
+    MINIO_POOL_SIZE,
+    MINIO_MAX_WORKERS,
+    MINIO_PUBLIC_HOSTNAME,
+    MINIO_REGION,
+    PRESIGNED_URL_EXPIRES,
 )
 from app.schemas import File
 from minio import Minio
+from minio.datatypes import Object, Part
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
 
 client = Minio(
     MINIO_HOSTNAME,
     access_key=MINIO_ACCESS_KEY,
     secret_key=MINIO_SECRET_KEY,
     secure=False,
+    http_client=urllib3.PoolManager(
+        maxsize=MINIO_POOL_SIZE,
+        block=True,  # wait for a free connection instead of opening extra ones
+        timeout=urllib3.Timeout.DEFAULT_TIMEOUT,
+        retries=urllib3.Retry(
+            total=5,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+    ),
 )
 bucket_name = MINIO_BUCKET
 
+# Only signs URLs for clients, never sends requests itself:
+# with the region given it doesn't have to look the bucket location up
+presign_client = Minio(
+    MINIO_PUBLIC_HOSTNAME,
+    access_key=MINIO_ACCESS_KEY,
+    secret_key=MINIO_SECRET_KEY,
+    secure=False,
+    region=MINIO_REGION,
+)
+
+# Minio client is synchronous, so every call runs in this bounded pool
+# to keep the event loop free. Its size caps concurrent MinIO requests.
+executor = ThreadPoolExecutor(max_workers=MINIO_MAX_WORKERS, thread_name_prefix="minio")
+
+
+async def run_in_executor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+# Bucket existence is cached for the life of the process.
+# It's provisioned at startup and re-checked only after a NoSuchBucket error.
+_bucket_ready = False
+_bucket_lock = threading.Lock()
+
+
+def _ensure_bucket(refresh: bool = False) -> None:
+    global _bucket_ready
+    if _bucket_ready and not refresh:
+        return
+
+    with _bucket_lock:
+        if _bucket_ready and not refresh:
+            return
+        if not client.bucket_exists(bucket_name):
+            try:
+                client.make_bucket(bucket_name)
+            except S3Error as e:
+                # Another worker may have created it in the meantime
+                if e.code not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+                    raise
+        _bucket_ready = True
+
+
+async def ensure_bucket() -> None:
+    await run_in_executor(_ensure_bucket)
+
+
+def _put_object(file: BinaryIO, filename: str, length: int) -> None:
+    _ensure_bucket()
+    start = file.tell()
+
+    try:
+        client.put_object(
+            bucket_name,
+            filename,
+            file,
+            length=length,
+            part_size=MINIO_PART_SIZE,
+        )
+    except S3Error as e:
+        if e.code != "NoSuchBucket":
+            raise
+        # Bucket was removed behind our back, provision it again and retry once
+        _ensure_bucket(refresh=True)
+        file.seek(start)
+        client.put_object(
+            bucket_name,
+            filename,
+            file,
+            length=length,
+            part_size=MINIO_PART_SIZE,
+        )
+
+
+async def upload_file(file: BinaryIO, filename: str, length: int = -1) -> str:
+    """
+    Streams file-like object to the bucket.
+    Objects bigger than MINIO_PART_SIZE (or of unknown length) are sent as a
+    multipart upload, so only one part is held in memory at a time.
+    """
+    await run_in_executor(_put_object, file, filename, length)
+
+    return get_object_url(filename)
+
+
+def get_object_url(filename: str) -> str:
+    return f"http://{MINIO_HOSTNAME}/{bucket_name}/{filename}"
+
+
+def blob_key(digest: str) -> str:
+    # Two-character prefix keeps listings of the bucket manageable
+    return f"blobs/{digest[:2]}/{digest}"
+
+
+def get_object_name(file: File) -> str:
+    if file.digest:
+        return blob_key(file.digest)
+    if file.object_key:
+        return file.object_key
+    # Uploaded before content addressing
+    return f"{file.name}{file.format}"
+
+
+def _hash_file(file: BinaryIO) -> tuple[str, int]:
+    sha256 = hashlib.sha256()
+    size = 0
+    while chunk := file.read(MINIO_PART_SIZE):
+        sha256.update(chunk)
+        size += len(chunk)
+    return sha256.hexdigest(), size
 
-async def upload_file(file: bytes, filename: str) -> str:
-    found = client.bucket_exists(bucket_name)
 
-    if not found:
-        client.make_bucket(bucket_name)
+async def hash_file(file: BinaryIO) -> tuple[str, int]:
+    """
+    Reads file-like object from its current position to the end.
+    Returns:
+        tuple: sha256 hex digest and size in bytes.
+    """
+    # hashlib releases the GIL on big buffers, so this doesn't stall the event loop either
+    return await run_in_executor(_hash_file, file)
 
-    client.put_object(
+
+def download_file_sync(file: File) -> BinaryIO:
+    """
+    Copies the object into a temp file on disk, which extraction processes
+    open by its name. Caller is responsible for closing it.
+    """
+    temp = NamedTemporaryFile(suffix=file.format)
+    response = client.get_object(bucket_name, get_object_name(file))
+    try:
+        shutil.copyfileobj(response, temp)
+        temp.flush()
+    except Exception:
+        temp.close()
+        raise
+    finally:
+        response.close()
+        response.release_conn()
+
+    temp.seek(0)
+    return temp
+
+
+def delete_file_sync(file: File) -> None:
+    """Blocking variant for code that already runs outside the event loop"""
+    client.remove_object(bucket_name, get_object_name(file))
+
+
+async def delete_file(file: File) -> None:
+    await run_in_executor(delete_file_sync, file)
+
+
+def delete_objects_sync(object_names: list[str]) -> dict[str, str]:
+    """
+    Removes objects with multi-object delete requests, up to 1000 keys each.
+    Missing objects count as deleted.
+    Returns:
+        dict: Error message by object name, for the objects that weren't removed.
+    """
+    errors: dict[str, str] = {}
+    for start in range(0, len(object_names), 1000):
+        batch = object_names[start:start + 1000]
+        # Errors are yielded lazily, the request is only sent once they're consumed
+        for error in client.remove_objects(bucket_name, (DeleteObject(name) for name in batch)):
+            errors[error.name] = error.message or error.code
+    return errors
+
+
+def presigned_put_url(filename: str, upload_id: str | None = None, part_number: int | None = None) -> str:
+    """URL to PUT the whole object to, or one part of a multipart upload if upload_id is given"""
+    params = {"uploadId": upload_id, "partNumber": str(part_number)} if upload_id else None
+    return presign_client.get_presigned_url(
+        "PUT",
         bucket_name,
         filename,
-        io.BytesIO(file),
-        length=len(file),
+        expires=timedelta(seconds=PRESIGNED_URL_EXPIRES),
+        extra_query_params=params,
     )
 
-    return f"http://{MINIO_HOSTNAME}/{bucket_name}/{filename}"
+
+def presigned_get_url(file: File) -> str:
+    return presign_client.presigned_get_object(
+        bucket_name,
+        get_object_name(file),
+        expires=timedelta(seconds=PRESIGNED_URL_EXPIRES),
+        # Content-addressed keys say nothing about the file, download it under its own name
+        response_headers={
+            "response-content-disposition": f"attachment; filename*=UTF-8''{quote(file.name + file.format)}"
+        },
+    )
+
+
+# Multipart uploads the client sends parts of through presigned URLs.
+# minio-py has no public API for these, the wrappers below are the only
+# callers of its private methods, as of minio==7.2.7 (pinned in
+# requirements.txt). Check their signatures before upgrading minio
+
+def _create_multipart_upload_sync(filename: str) -> str:
+    return client._create_multipart_upload(bucket_name, filename, {})
+
+
+def _complete_multipart_upload_sync(filename: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+    client._complete_multipart_upload(
+        bucket_name, filename, upload_id, [Part(part_number, etag) for part_number, etag in sorted(parts)]
+    )
+
+
+def abort_multipart_upload_sync(filename: str, upload_id: str) -> None:
+    """Drops the upload and its uploaded parts, an upload that's already gone counts as aborted"""
+    try:
+        client._abort_multipart_upload(bucket_name, filename, upload_id)
+    except S3Error as e:
+        if e.code != "NoSuchUpload":
+            raise
+
+
+async def create_multipart_upload(filename: str) -> str:
+    """Returns upload id, parts are uploaded by the client through presigned_put_url"""
+    return await run_in_executor(_create_multipart_upload_sync, filename)
+
+
+async def complete_multipart_upload(filename: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+    """Assembles uploaded (part_number, etag) parts into the object"""
+    await run_in_executor(_complete_multipart_upload_sync, filename, upload_id, parts)
+
+
+async def abort_multipart_upload(filename: str, upload_id: str) -> None:
+    await run_in_executor(abort_multipart_upload_sync, filename, upload_id)
+
+
+async def delete_object(filename: str) -> None:
+    await run_in_executor(client.remove_object, bucket_name, filename)
 
 
-def delete_file(file: File) -> None:
-    client.remove_object(bucket_name, f"{file.name}{file.format}")
+async def stat_object(filename: str) -> Object | None:
+    try:
+        return await run_in_executor(client.stat_object, bucket_name, filename)
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+        return None
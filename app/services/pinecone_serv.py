@@ -1,71 +1,130 @@
+import threading
 import time
-from pinecone import Pinecone, ServerlessSpec, Index, Vector
-from sentence_transformers import SentenceTransformer
-from app.config import PINECONE_API_KEY, PINECONE_INDEX
+from typing import TYPE_CHECKING
 
+import numpy as np
+from app.config import PINECONE_API_KEY, PINECONE_INDEX, EMBEDDING_DIMENSION
+from app.services.vector_store import VectorStore
 
-class PineconeService:
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+if TYPE_CHECKING:
+    from pinecone import Pinecone, Index
+
+
+class PineconeService(VectorStore):
     index_name = PINECONE_INDEX
+    namespace = "docs-ns"
+
+    def __init__(self):
+        # Client and index handle are built on first use, so importing the
+        # app doesn't need network access to Pinecone
+        self._pc: "Pinecone | None" = None
+        self._pc_index: "Index | None" = None
+        self._lock = threading.Lock()
+
+    @property
+    def pc(self) -> "Pinecone":
+        if self._pc is None:
+            with self._lock:
+                if self._pc is None:
+                    from pinecone import Pinecone
+
+                    self._pc = Pinecone(api_key=PINECONE_API_KEY)
+        return self._pc
 
     def __create_pc_index(self) -> None:
+        from pinecone import ServerlessSpec
+
         self.pc.create_index(
             name=self.index_name,
-            dimension=384,
+            dimension=EMBEDDING_DIMENSION,
             spec=ServerlessSpec(
-                cloud='aws', 
+                cloud='aws',
                 region='us-east-1'
-            ) 
+            )
         )
 
-    def __get_pc_index(self) -> Index:
-        if self.index_name not in self.pc.list_indexes().names():
-            self.__create_pc_index()
-            time.sleep(1)
-        return self.pc.Index(self.index_name)
-    
-    def __get_list_of_chunks(self, text: str, chunk_size: int = 1050, overlap: int = 50) -> list[str]:
-        """
-        Splits text into chunks of a specific size with optional overlap.
-        Args:
-            text (str): The text to split.
-            chunk_size (int): The number of characters per chunk.
-            overlap (int): The number of overlapping characters between chunks.
-        Returns:
-            list: A list of text chunks.
-        """
-        chunks = []
-        for i in range(0, len(text), chunk_size - overlap):
-            chunks.append(text[i:i + chunk_size])
-        return chunks
-    
-    def upload_embeddings(self, document_data: str, document_id: str) -> None:
+    def __get_pc_index(self) -> "Index":
+        # Index handle is cached, listing indexes on every call costs a round trip
+        if self._pc_index is None:
+            pc = self.pc
+            with self._lock:
+                if self._pc_index is None:
+                    if self.index_name not in pc.list_indexes().names():
+                        self.__create_pc_index()
+                        time.sleep(1)
+                    self._pc_index = pc.Index(self.index_name)
+        return self._pc_index
+
+    def warm_up(self) -> None:
+        self.__get_pc_index()
+
+    def upsert(
+        self, document_id: str, user_id: int, chunks: list[str], embeddings: np.ndarray, first_chunk: int = 0
+    ) -> None:
+        from pinecone import Vector
+
+        if first_chunk == 0:
+            # Re-indexing replaces the whole document, upserts alone would keep
+            # chunks beyond the new count
+            self.delete([document_id])
+
         # Each contains an 'id', the embedding 'values', and the original text as 'metadata'
-        chunks: list[str] = self.__get_list_of_chunks(document_data)
         pc_index = self.__get_pc_index()
-        vectors = []
-        for i, chunk in enumerate(chunks):
-            embedding = self.model.encode(chunk).tolist()
-            vector_id = f"{document_id}_{i}"  # Unique ID for each chunk
-            vectors.append(
-                Vector(
-                    id=vector_id,
-                    values=embedding,
-                    metadata={"text": chunk, "doc_id": document_id}
-                )
+        vectors = [
+            Vector(
+                id=f"{document_id}_{i}",  # Unique ID for each chunk
+                values=values,
+                metadata={"text": chunk, "doc_id": document_id, "user_id": user_id}
             )
+            # One conversion of the whole matrix instead of a .tolist() per chunk
+            for i, (chunk, values) in enumerate(zip(chunks, embeddings.tolist()), start=first_chunk)
+        ]
 
-        pc_index.upsert(vectors=vectors, namespace="docs-ns")
+        # Requests are limited to 2MB, chunk text in metadata adds up quickly
+        pc_index.upsert(vectors=vectors, namespace=self.namespace, batch_size=100)
 
-    def get_matched_embeddings(self, query: str):
-        query_embedding = self.model.encode(query).tolist()
+    def query(self, embedding: np.ndarray, top_k: int, user_id: int | None = None) -> list[dict]:
         pc_index = self.__get_pc_index()
         results = pc_index.query(
-            namespace="docs-ns",
-            vector=query_embedding,
-            top_k=3,
+            namespace=self.namespace,
+            vector=embedding.tolist(),
+            top_k=top_k,
+            # Filtered inside the index, so other users' documents don't take up top_k
+            filter={"user_id": {"$eq": user_id}} if user_id is not None else None,
             include_values=False,
             include_metadata=True
         )
-        return results
+        return [
+            {"id": match["id"], "score": match["score"], "metadata": match["metadata"]}
+            for match in results["matches"]
+        ]
+
+    def fetch_document(self, document_id: str) -> tuple[list[str], np.ndarray]:
+        pc_index = self.__get_pc_index()
+        ids = [
+            vector_id
+            for page in pc_index.list(prefix=f"{document_id}_", namespace=self.namespace)
+            for vector_id in page
+        ]
+        vectors = {}
+        # Ids go into the query string, keep requests well under URL limits
+        for start in range(0, len(ids), 100):
+            vectors.update(pc_index.fetch(ids=ids[start:start + 100], namespace=self.namespace).vectors)
+
+        ordered = sorted(vectors.values(), key=lambda vector: int(vector.id.rsplit("_", 1)[1]))
+        chunks = [vector.metadata["text"] for vector in ordered]
+        embeddings = np.array([vector.values for vector in ordered], dtype=np.float32)
+        return chunks, embeddings.reshape(len(ordered), EMBEDDING_DIMENSION)
+
+    def delete(self, document_ids: list[str]) -> None:
+        pc_index = self.__get_pc_index()
+        # Serverless indexes can't delete by metadata, so look up chunk ids by prefix
+        ids = [
+            vector_id
+            for document_id in document_ids
+            for page in pc_index.list(prefix=f"{document_id}_", namespace=self.namespace)
+            for vector_id in page
+        ]
+        # Delete requests take at most 1000 ids
+        for start in range(0, len(ids), 1000):
+            pc_index.delete(ids=ids[start:start + 1000], namespace=self.namespace)
@@ -1,70 +1,149 @@
-import pdfplumber
-import pandas as pd
-from io import BytesIO
+import codecs
 from abc import ABC, abstractmethod
-from docx import Document
-from pptx import Presentation
+from typing import BinaryIO, Iterator
+
+from app.config import PDF_ENGINE, XLSX_MAX_ROWS, XLSX_MAX_CELLS
+
+# Parsing libraries are imported inside iter_text(), they take seconds to
+# import and most requests never extract anything
 
 
 class BaseExtractor(ABC):
-    def __init__(self, file: bytes):
+    def __init__(self, file: BinaryIO):
+        # file-like object, e.g. spooled temp file of UploadFile
         self.file = file
 
     @abstractmethod
-    def extract(self):
+    def iter_text(self) -> Iterator[str]:
+        """
+        Yields document text piece by piece (page, slide, paragraph), so it's never held whole.
+        Paragraphs, pages and slides end with an empty line, chunkers break on it.
+        """
         ...
 
+    def extract(self):
+        try:
+            return "".join(self.iter_text())
+        except Exception as e:
+            return {"error": f"Failed to extract text: {str(e)}"}
+
 
 class PDFExtractor(BaseExtractor):
-    def extract(self):
-        with pdfplumber.open(BytesIO(self.file)) as pdf:
-            text = "".join([page.extract_text() for page in pdf.pages])
-            return text.replace("\n", " ")
-        
+    engines = ("pdfium", "pdfplumber")
+
+    def __init__(self, file: BinaryIO, engine: str = PDF_ENGINE):
+        super().__init__(file)
+        if engine not in self.engines:
+            raise ValueError(f"Unsupported PDF engine: {engine}")
+        self.engine = engine
+
+    def iter_text(self) -> Iterator[str]:
+        if self.engine == "pdfium":
+            try:
+                pdf = self._open_pdfium()
+            except Exception as e:
+                # Not installed, or a file pdfium rejects that pdfminer may still parse
+                print(f"pdfium can't open the file, falling back to pdfplumber: {e}")
+                self.file.seek(0)
+            else:
+                return self._iter_pdfium(pdf)
+        return self._iter_pdfplumber()
+
+    def _open_pdfium(self):
+        import pypdfium2
+
+        return pypdfium2.PdfDocument(self.file)
+
+    def _iter_pdfium(self, pdf) -> Iterator[str]:
+        # Text in content stream order, no layout analysis
+        try:
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_range().replace("\r\n", " ").replace("\n", " ") + "\n\n"
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+    def _iter_pdfplumber(self) -> Iterator[str]:
+        import pdfplumber
+
+        with pdfplumber.open(self.file) as pdf:
+            for page in pdf.pages:
+                yield (page.extract_text() or "").replace("\n", " ") + "\n\n"
+                # pdfplumber caches parsed layout objects on the page until it's closed
+                page.close()
+
 
 class XLSXExtractor(BaseExtractor):
-    # TODO: figure out how to return data properly
-    def extract(self):
-        data = pd.read_excel(BytesIO(self.file))
-        return data.head().to_csv()
+    def __init__(self, file: BinaryIO, max_rows: int = XLSX_MAX_ROWS, max_cells: int = XLSX_MAX_CELLS):
+        super().__init__(file)
+        self.max_rows = max_rows
+        self.max_cells = max_cells
 
+    def iter_text(self) -> Iterator[str]:
+        from openpyxl import load_workbook
 
-class DOCXExtractor(BaseExtractor):
-    def extract(self):
+        # read_only parses rows lazily from the sheet XML instead of building every cell
+        workbook = load_workbook(self.file, read_only=True, data_only=True)
+        rows = cells = 0
         try:
-            doc = Document(BytesIO(self.file))
-            return " ".join([p.text for p in doc.paragraphs])
-        except Exception as e:
-            return {"error": f"Failed to extract text: {str(e)}"}
-        
+            for sheet in workbook.worksheets:
+                yield f"{sheet.title}\n\n"
+                # Some writers store a wrong sheet size, which would cut iteration short
+                sheet.reset_dimensions()
+                for row in sheet.iter_rows(values_only=True):
+                    values = [str(value) for value in row if value is not None]
+                    if not values:
+                        continue
+                    if rows >= self.max_rows or cells + len(values) > self.max_cells:
+                        return
+                    rows += 1
+                    cells += len(values)
+                    yield ", ".join(values) + "\n\n"
+        finally:
+            workbook.close()
+
+
+class DOCXExtractor(BaseExtractor):
+    def iter_text(self) -> Iterator[str]:
+        from docx import Document
+
+        doc = Document(self.file)
+        for p in doc.paragraphs:
+            yield p.text + "\n\n"
+
 
 class PPTXExtractor(BaseExtractor):
-    def extract(self):
-        try:
-            presentation = Presentation(BytesIO(self.file))
-            text = ""
-            for slide in presentation.slides:
-                for shape in slide.shapes:
-                    if shape.has_text_frame:
-                        text += shape.text + " "
-            return text
-        except Exception as e:
-            return {"error": f"Failed to extract text: {str(e)}"}
-    
+    def iter_text(self) -> Iterator[str]:
+        from pptx import Presentation
+
+        presentation = Presentation(self.file)
+        for slide in presentation.slides:
+            for shape in slide.shapes:
+                if shape.has_text_frame:
+                    yield shape.text + "\n\n"
+
 
 class TXTExtractor(BaseExtractor):
-    def extract(self):
-        try:
-            return self.file.decode('utf-8').replace("\n", " ")
-        except Exception as e:
-            return {"error": f"Failed to extract text: {str(e)}"}
-        
+    # Bytes decoded per piece
+    read_size = 64 * 1024
+
+    def iter_text(self) -> Iterator[str]:
+        # Incremental decoder keeps multi-byte characters split between reads intact
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        while data := self.file.read(self.read_size):
+            yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
 
 class TextExtractor(BaseExtractor):
     file_types = {
         ".pdf": PDFExtractor,
         ".xlsx": XLSXExtractor,
-        ".xls": XLSXExtractor,
         ".docx": DOCXExtractor,
         ".doc": DOCXExtractor,
         ".pptx": PPTXExtractor,
@@ -72,16 +151,20 @@ class TextExtractor(BaseExtractor):
         ".txt": TXTExtractor,
     }
 
-    def __init__(self, file: bytes, file_ext: str):
+    def __init__(self, file: BinaryIO, file_ext: str, pdf_engine: str = PDF_ENGINE):
         super().__init__(file)
         self.file_ext = file_ext
+        self.pdf_engine = pdf_engine
 
-    def extract(self):
+    def iter_text(self) -> Iterator[str]:
         file_ext = self.file_ext.lower()
         if file_ext not in self.file_types:
             raise ValueError(f"Unsupported file type: {file_ext}")
-        
+
         extractor_class = self.file_types[file_ext]
-        extractor: BaseExtractor = extractor_class(self.file)
-        
-        return extractor.extract()
+        if extractor_class is PDFExtractor:
+            extractor: BaseExtractor = PDFExtractor(self.file, engine=self.pdf_engine)
+        else:
+            extractor = extractor_class(self.file)
+
+        return extractor.iter_text()
@@ -0,0 +1,122 @@
+import asyncio
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+from app.config import VECTOR_STORE_BACKEND, AI_SEARCH_TOP_K, AI_SEARCH_OVERFETCH, EMBEDDING_BATCH_SIZE
+from app.services.cache import query_embedding_cache, normalize_query
+from app.services.chunking import batched
+from app.services.embedding import embedding_service
+
+
+class VectorStore(ABC):
+    """
+    Chunks and encodes documents, backends only store and search vectors.
+    Vector ids are "{document_id}_{chunk_number}", every vector has
+    {"text": chunk, "doc_id": document_id, "user_id": owner} metadata.
+    """
+
+    @abstractmethod
+    def upsert(
+        self, document_id: str, user_id: int, chunks: list[str], embeddings: np.ndarray, first_chunk: int = 0
+    ) -> None:
+        """
+        Stores chunks as chunk numbers first_chunk, first_chunk + 1, ...
+        A document is upserted in consecutive batches, the one with
+        first_chunk 0 replaces whatever the document had before.
+        """
+        ...
+
+    @abstractmethod
+    def query(self, embedding: np.ndarray, top_k: int, user_id: int | None = None) -> list[dict]:
+        """
+        Returns:
+            list: Chunk matches as {"id": ..., "score": ..., "metadata": ...}, best first,
+                only of user_id documents if it's given.
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, document_ids: list[str]) -> None:
+        ...
+
+    @abstractmethod
+    def fetch_document(self, document_id: str) -> tuple[list[str], np.ndarray]:
+        """
+        Returns:
+            tuple: Document's chunks in order and their embeddings, empty if it isn't stored.
+        """
+        ...
+
+    def warm_up(self) -> None:
+        """Opens clients or files up front, backends override it if they have anything to open"""
+
+    def upload_chunks(self, chunks: Iterable[str], document_id: str, user_id: int) -> int:
+        """
+        Encodes and upserts streamed chunks one batch at a time, so only a
+        batch of chunks and embeddings is in memory at once.
+        Returns:
+            int: Number of chunks stored.
+        """
+        count = 0
+        for batch in batched(chunks, EMBEDDING_BATCH_SIZE):
+            embeddings = embedding_service.encode_documents(batch)
+            self.upsert(document_id, user_id, batch, embeddings, first_chunk=count)
+            count += len(batch)
+        if not count:
+            # No batch replaced what an earlier indexing stored
+            self.delete([document_id])
+        return count
+
+    def copy_document(self, source_id: str, document_id: str, user_id: int) -> bool:
+        """
+        Stores source document's vectors again under document_id and user_id,
+        for files with the same content. Nothing is re-encoded.
+        Returns:
+            bool: False if the source has no vectors to copy.
+        """
+        chunks, embeddings = self.fetch_document(source_id)
+        if not chunks:
+            return False
+
+        self.upsert(document_id, user_id, chunks, embeddings)
+        return True
+
+    async def get_matched_embeddings(self, query: str, user_id: int, top_k: int = AI_SEARCH_TOP_K) -> list[dict]:
+        """
+        Returns:
+            list: Best matching chunk of each of the top_k user's documents, by score.
+        """
+        query = normalize_query(query)
+        query_embedding = query_embedding_cache.get(query)
+        if query_embedding is None:
+            query_embedding = await embedding_service.encode_query(query)
+            query_embedding_cache.set(query, query_embedding)
+
+        # Backends may block on network or disk, keep them off the event loop
+        matches = await asyncio.to_thread(
+            self.query, query_embedding, top_k * AI_SEARCH_OVERFETCH, user_id
+        )
+
+        # Matches come sorted, so the first chunk seen is the document's best one
+        best_by_doc: dict[str, dict] = {}
+        for match in matches:
+            best_by_doc.setdefault(match["metadata"]["doc_id"], match)
+        return list(best_by_doc.values())[:top_k]
+
+
+@lru_cache(maxsize=None)
+def get_vector_store() -> VectorStore:
+    """Process-wide store of the backend selected by VECTOR_STORE_BACKEND"""
+    if VECTOR_STORE_BACKEND == "pinecone":
+        from app.services.pinecone_serv import PineconeService
+
+        return PineconeService()
+    if VECTOR_STORE_BACKEND == "local":
+        from app.services.local_vector_store import LocalVectorStore
+
+        return LocalVectorStore()
+
+    raise ValueError(f"Unsupported vector store backend: {VECTOR_STORE_BACKEND}")
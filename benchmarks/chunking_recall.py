@@ -0,0 +1,125 @@
+"""
+Measures retrieval recall of chunking strategies against the number of
+chunks they produce (i.e. embedding cost).
+
+A synthetic corpus hides one-sentence facts about made-up entities among
+filler paragraphs. Every fact becomes a query ("How much does X weigh?"),
+a query is recalled at k if one of the top k chunks of the whole corpus
+holds the entity and the answer together. Chunks are embedded with the
+app's embedding model, which truncates them to its max sequence length
+exactly as in production, so text past the limit can't be recalled.
+
+Usage:
+    python -m benchmarks.chunking_recall [--docs 40] [--queries 200] [--max-tokens 256 128]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.chunking import FixedChunker, SentenceChunker, load_tokenizer
+from app.services.embedding import embedding_service
+
+FILLER = (
+    "storage files documents users search index vector query upload folder "
+    "archive report budget meeting project review schedule team data system "
+    "network service update release notes summary quarter process policy"
+).split()
+
+FACTS = [
+    ("{entity} weighs {number} kilograms.", "How much does {entity} weigh?", "{number} kilograms"),
+    ("{entity} was founded in the year {number}.", "When was {entity} founded?", "year {number}"),
+    ("The serial number of {entity} is {number}.", "What is the serial number of {entity}?", "is {number}"),
+]
+
+
+def _entity(rng: random.Random) -> str:
+    syllables = ["zor", "blat", "quin", "dex", "mor", "vel", "tash", "rik", "pol", "nar"]
+    return "".join(rng.choice(syllables) for _ in range(3)).capitalize() + f"-{rng.randint(100, 999)}"
+
+
+def _filler_sentence(rng: random.Random) -> str:
+    words = [rng.choice(FILLER) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_corpus(docs: int, paragraphs: int, facts_per_doc: int, seed: int) -> tuple[list[list[str]], list[tuple[str, str, str]]]:
+    """
+    Returns:
+        tuple: Documents as extractor-style pieces, and (query, entity, answer) triples.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    queries = []
+    for _ in range(docs):
+        sentences = [[_filler_sentence(rng) for _ in range(rng.randint(3, 8))] for _ in range(paragraphs)]
+        for _ in range(facts_per_doc):
+            fact, query, answer = rng.choice(FACTS)
+            values = {"entity": _entity(rng), "number": rng.randint(1000, 99999)}
+            paragraph = rng.choice(sentences)
+            paragraph.insert(rng.randint(0, len(paragraph)), fact.format(**values))
+            queries.append((query.format(**values), values["entity"], answer.format(**values)))
+        # Paragraphs end with an empty line, as extractors emit them
+        corpus.append([" ".join(paragraph) + "\n\n" for paragraph in sentences])
+    return corpus, queries
+
+
+def evaluate(name: str, chunker, corpus: list[list[str]], queries, top_ks: list[int], max_tokens: int) -> None:
+    chunks = [chunk for pieces in corpus for chunk in chunker.chunks(pieces)]
+
+    tokenizer = load_tokenizer()
+    lengths = [len(encoding.ids) for encoding in tokenizer.encode_batch(chunks, add_special_tokens=False)]
+    limit = max_tokens - 2
+    truncated = sum(max(0, length - limit) for length in lengths) / max(sum(lengths), 1)
+
+    start = time.perf_counter()
+    chunk_embeddings = embedding_service.encode_documents(chunks)
+    encode_seconds = time.perf_counter() - start
+    query_embeddings = embedding_service.encode_documents([query for query, _, _ in queries])
+
+    chunk_embeddings /= np.linalg.norm(chunk_embeddings, axis=1, keepdims=True)
+    query_embeddings /= np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+    ranking = np.argsort(-(query_embeddings @ chunk_embeddings.T), axis=1)
+
+    print(f"{name}:")
+    print(f"  chunks: {len(chunks)}, mean {np.mean(lengths):.0f} tokens, {truncated:.1%} of tokens past the model limit")
+    print(f"  encode: {encode_seconds:.1f}s")
+    for k in top_ks:
+        hits = sum(
+            any(entity in chunks[i] and answer in chunks[i] for i in ranking[q, :k])
+            for q, (_, entity, answer) in enumerate(queries)
+        )
+        print(f"  recall@{k}: {hits / len(queries):.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200, help="facts hidden in the corpus, one query each")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--max-tokens", type=int, nargs="+", default=[256, 128],
+                        help="token budgets of the sentence strategy; the model limit is taken from the first")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    facts_per_doc = max(1, args.queries // args.docs)
+    corpus, queries = make_corpus(args.docs, args.paragraphs, facts_per_doc, args.seed)
+    print(f"Corpus: {args.docs} documents, {len(queries)} queries")
+
+    model_limit = args.max_tokens[0]
+    evaluate("fixed 1050/50 chars", FixedChunker(), corpus, queries, args.top_k, model_limit)
+    for max_tokens in args.max_tokens:
+        evaluate(
+            f"sentence {max_tokens} tokens",
+            SentenceChunker(max_tokens=max_tokens),
+            corpus,
+            queries,
+            args.top_k,
+            model_limit,
+        )
+
+
+if __name__ == "__main__":
+    main()
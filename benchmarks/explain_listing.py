@@ -0,0 +1,102 @@
+"""
+EXPLAIN check for the hot listing queries: fails (exit code 1) when a query
+can't use any of the indexes it's supposed to, e.g. after a predicate change breaks
+the match with a partial index.
+
+Sequential scans are disabled for the check, so the result doesn't depend
+on table size; a query that can't use the index still gets a Seq Scan.
+
+Usage:
+    alembic upgrade head
+    python -m benchmarks.explain_listing
+
+tests/test_explain_listing.py runs the same checks under pytest.
+"""
+import json
+import sys
+
+from sqlalchemy import Connection, Select, select, false, text, true
+from sqlalchemy.dialects import postgresql
+
+from app import models
+from app.database import engine
+from app.pagination import keyset_paginate
+
+USER_ID = 1
+
+CHECKS = {
+    "/files": (
+        keyset_paginate(
+            select(models.File, models.Favorite.id)
+            .filter(models.File.user_id == USER_ID, models.File.should_delete == false())
+            .join(models.Favorite, isouter=True),
+            None,
+            50,
+        ),
+        ["ix_files_user_id_created_at_id_active"],
+    ),
+    "/favorites": (
+        keyset_paginate(
+            select(models.File, models.Favorite.id)
+            .filter(models.File.user_id == USER_ID, models.File.should_delete == false())
+            .join(models.File.favorites),
+            None,
+            50,
+        ),
+        ["ix_files_user_id_created_at_id_active", "ix_favorites_file_id"],
+    ),
+    "/deleted": (
+        keyset_paginate(
+            select(models.File).filter(models.File.user_id == USER_ID, models.File.should_delete == true()),
+            None,
+            50,
+        ),
+        ["ix_files_user_id_created_at_id_trashed"],
+    ),
+    "favorites by user": (
+        select(models.Favorite).filter_by(user_id=USER_ID),
+        ["ix_favorites_user_id"],
+    ),
+    "favorites by file": (
+        select(models.Favorite).filter_by(file_id=1),
+        ["ix_favorites_file_id"],
+    ),
+    "scheduled job by file": (
+        select(models.ScheduledJob).filter_by(file_id=1),
+        ["ix_scheduled_jobs_file_id"],
+    ),
+}
+
+
+def used_indexes(plan: dict) -> set[str]:
+    found = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= used_indexes(child)
+    return found
+
+
+def explain_indexes(connection: Connection, statement: Select) -> set[str]:
+    """Indexes in the statement's plan, expects SET enable_seqscan = off on the connection"""
+    sql = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return used_indexes(plan[0]["Plan"])
+
+
+def main() -> int:
+    failed = False
+    with engine.connect() as connection:
+        connection.execute(text("SET enable_seqscan = off"))
+        for name, (statement, expected) in CHECKS.items():
+            indexes = explain_indexes(connection, statement)
+            ok = bool(indexes.intersection(expected))
+            status = "ok" if ok else "FAIL"
+            failed |= not ok
+            print(f"{status:4} {name}: uses {', '.join(sorted(indexes)) or 'no index'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Closed-loop load test of a listing endpoint against a running server.
+Every worker sends the next request as soon as the previous one returns;
+reports throughput and latency percentiles.
+
+Run it before and after a change with the same arguments, e.g.:
+    uvicorn app.main:app --workers 1
+    python -m benchmarks.load_listing --path /api/v1/files --concurrency 50 --duration 30
+
+The bearer token is signed with JWT_SECRET_KEY / JWT_ALGORITHM from .env,
+so the server and the benchmark must share them.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import jwt
+
+from app.config import JWT_SECRET_KEY, ALGORITHM
+
+
+def make_token(user_id: int) -> str:
+    payload = {
+        "user_id": user_id,
+        "isAuth": True,
+        "exp": datetime.utcnow() + timedelta(hours=1),
+    }
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=ALGORITHM)
+
+
+async def worker(client: httpx.AsyncClient, path: str, deadline: float, latencies: list[float], errors: list[int]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def run(args) -> None:
+    headers = {"Authorization": f"Bearer {make_token(args.user_id)}"}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    latencies: list[float] = []
+    errors: list[int] = []
+
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + args.duration
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(worker(client, args.path, deadline, latencies, errors) for _ in range(args.concurrency))
+        )
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{args.path}: {len(latencies)} requests in {elapsed:.1f}s, concurrency {args.concurrency}")
+    print(f"  throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"  p50: {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"  p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms")
+    print(f"  p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+    print(f"  errors: {len(errors)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/files")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Compares PDF extraction engines on a corpus of generated text PDFs:
+pages per second and peak memory (max RSS) of a fresh process per engine.
+
+Usage:
+    python -m benchmarks.pdf_extraction [--docs 5] [--pages 200] [--engines pdfium pdfplumber]
+
+The PDFs are written by hand (Helvetica text, one content stream per page),
+so the benchmark needs nothing beyond the extraction engines themselves.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+WORDS = (
+    "storage file document index search vector query upload delete restore "
+    "bucket object page text chunk embedding user favorite trash worker"
+).split()
+
+PROBE = """
+import json, resource, sys, time
+from app.services.text_extractor import PDFExtractor
+
+engine, paths = sys.argv[1], sys.argv[2:]
+pages = chars = 0
+start = time.perf_counter()
+for path in paths:
+    with open(path, "rb") as file:
+        for piece in PDFExtractor(file, engine=engine).iter_text():
+            pages += 1
+            chars += len(piece)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "pages": pages,
+    "chars": chars,
+    "seconds": elapsed,
+    # Kilobytes on Linux
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def _page_stream(rng: random.Random, lines: int) -> bytes:
+    commands = ["BT", "/F1 10 Tf", "12 TL", "50 790 Td"]
+    for _ in range(lines):
+        line = " ".join(rng.choice(WORDS) for _ in range(12))
+        commands.append(f"({line}) Tj T*")
+    commands.append("ET")
+    return "\n".join(commands).encode()
+
+
+def write_pdf(path: str, pages: int, lines_per_page: int = 60, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    # Objects 1-3: catalog, page tree, font; then a page and its content stream per page
+    page_ids = [4 + 2 * i for i in range(pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + " ".join(f"{i} 0 R" for i in page_ids).encode()
+        + b"] /Count " + str(pages).encode() + b" >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_id in page_ids:
+        stream = _page_stream(rng, lines_per_page)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream")
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            f.write(f"{offset:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def run_engine(engine: str, paths: list[str]) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, engine, *paths], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--engines", nargs="+", default=["pdfium", "pdfplumber"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus:
+        paths = []
+        for i in range(args.docs):
+            path = os.path.join(corpus, f"doc_{i}.pdf")
+            write_pdf(path, args.pages, seed=i)
+            paths.append(path)
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print(f"Corpus: {args.docs} PDFs x {args.pages} pages, {size_mb:.1f} MB")
+
+        for engine in args.engines:
+            result = run_engine(engine, paths)
+            print(f"{engine}:")
+            print(f"  pages/s: {result['pages'] / result['seconds']:.1f} ({result['seconds']:.2f}s total)")
+            print(f"  max RSS: {result['max_rss_mb']:.1f} MB")
+            print(f"  chars:   {result['chars']}")
+
+
+if __name__ == "__main__":
+    main()
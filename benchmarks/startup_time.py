@@ -0,0 +1,62 @@
+"""
+Measures how long a fresh interpreter takes to import app.main, i.e. the
+part of worker startup before uvicorn can serve /connection, and reports
+which heavy modules got imported on the way.
+
+Usage:
+    python -m benchmarks.startup_time [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "pandas",
+    "pdfplumber",
+    "pypdfium2",
+    "docx",
+    "pptx",
+    "pinecone",
+]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": elapsed,
+    "heavy": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def run_once() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    timings = [result["seconds"] for result in results]
+
+    print(f"import app.main over {args.runs} runs")
+    print(f"  median: {statistics.median(timings) * 1000:.1f} ms")
+    print(f"  min:    {min(timings) * 1000:.1f} ms")
+    print(f"  max:    {max(timings) * 1000:.1f} ms")
+    print(f"  heavy modules imported: {', '.join(results[-1]['heavy']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
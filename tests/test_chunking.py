@@ -0,0 +1,64 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.chunking import SentenceChunker
+
+
+class WhitespaceTokenizer:
+    """Stand-in for the model tokenizer, one token per word"""
+
+    def encode_batch(self, texts, add_special_tokens=False):
+        return [self._encode(text) for text in texts]
+
+    def _encode(self, text):
+        offsets = [match.span() for match in re.finditer(r"\S+", text)]
+        return SimpleNamespace(ids=list(range(len(offsets))), offsets=offsets)
+
+
+def words(count, start=0):
+    return " ".join(f"w{i}" for i in range(start, start + count))
+
+
+def make_chunker(max_tokens=256, overlap_tokens=32):
+    return SentenceChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, tokenizer=WhitespaceTokenizer())
+
+
+def token_counts(chunker, pieces):
+    return [len(chunk.split()) for chunk in chunker.chunks(pieces)]
+
+
+@pytest.mark.parametrize(
+    "pieces",
+    [
+        # Page ending a paragraph, then a page without punctuation longer than a chunk
+        [words(110) + ". " + words(30, 110) + ".\n\n", words(400, 140) + "\n\n"],
+        # Chunk closed at a paragraph end, next sentence doesn't fit next to the overlap
+        [words(120) + ". " + words(20, 120) + ".\n\n", words(240, 140) + ".\n\n"],
+        # Many short rows, as spreadsheets are extracted
+        [f"{words(9, i * 9)}.\n\n" for i in range(200)],
+        # Over-long sentences in the middle of a paragraph
+        [words(30) + ". " + words(1000, 30) + ". " + words(30, 1030) + ".\n\n"],
+    ],
+)
+def test_chunks_stay_within_budget(pieces):
+    chunker = make_chunker()
+    counts = token_counts(chunker, pieces)
+    assert counts
+    assert max(counts) <= chunker.budget
+
+
+def test_no_text_is_lost():
+    chunker = make_chunker(overlap_tokens=0)
+    pieces = [words(110) + ". " + words(30, 110) + ".\n\n", words(400, 140) + "\n\n"]
+    chunks = list(chunker.chunks(pieces))
+    assert " ".join(chunks).replace(".", "").split() == words(540).split()
+
+
+def test_chunks_overlap_by_trailing_sentences():
+    chunker = make_chunker(max_tokens=22, overlap_tokens=5)
+    sentences = [words(5, i * 5) + "." for i in range(8)]
+    chunks = list(chunker.chunks([" ".join(sentences)]))
+    assert chunks[0].endswith(sentences[3])
+    assert chunks[1].startswith(sentences[3])
@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import engine
+from benchmarks.explain_listing import CHECKS, explain_indexes
+
+
+@pytest.fixture(scope="module")
+def connection():
+    # Needs a database migrated to head, e.g. the docker-compose one
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SET enable_seqscan = off"))
+            yield connection
+    except OperationalError as e:
+        pytest.skip(f"No database available: {e}")
+
+
+@pytest.mark.parametrize("name", CHECKS)
+def test_query_uses_index(connection, name):
+    statement, expected = CHECKS[name]
+    indexes = explain_indexes(connection, statement)
+    assert indexes.intersection(expected), f"{name} uses {sorted(indexes) or 'no index'}, expected one of {expected}"